@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Synthetic season generator for scale testing.
+
+Builds a new SQLite database (through init_db, so the schema and seed teams
+match the server) and bulk-inserts users, a round-robin draw, results, tips,
+groups and memberships, then scores the played rounds and rebuilds the
+leaderboard totals, round scores and standings with the server's own SQL.
+
+Team strength drives the results; each user has an engagement level (how
+many rounds they tip), a favourite team they back, and a tipping skill.
+Tips cluster just before each deadline. Output is deterministic for a given
+--seed and --start.
+
+Every user shares one PBKDF2 hash of --password, computed once, so logins
+work without hashing per user.
+
+    python3 bench/generate_season.py season.db [--users 100000] [--rounds 18] [--played 12] [--seed 1]
+"""
+
+import argparse, json, math, os, sys, time
+import random
+from datetime import date, datetime, time as dtime, timedelta
+
+BATCH = 50_000  # rows per transaction
+
+FIRST = ["Aroha", "Ben", "Caleb", "Dylan", "Emma", "Finn", "Georgia", "Hemi", "Isla", "Jack", "Kahu",
+         "Liam", "Mia", "Nikau", "Olivia", "Pita", "Quinn", "Rawiri", "Sophie", "Tama", "Ursula", "Vai",
+         "Wiremu", "Xavier", "Yasmin", "Zoe"]
+LAST = ["Anderson", "Brown", "Clarke", "Davies", "Edwards", "Ngata", "Harris", "Jones", "King", "Lee",
+        "Martin", "Nikora", "O'Connor", "Parata", "Robinson", "Smith", "Taylor", "Tuhiwai", "Walker",
+        "Williams", "Wilson", "Young"]
+GROUP_WORDS = ["Office", "Clubrooms", "Whanau", "Old Boys", "Netball Mums", "Dairy Farmers", "Surf Club",
+               "Tuesday Touch", "Front Row", "Sideline", "Bench", "Grandstand", "Kitchen", "Workshop"]
+CODE_CHARS = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"
+
+
+def batched(rows, size=BATCH):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def insert(conn, sql, rows):
+    n = 0
+    for batch in batched(rows):
+        conn.execute("BEGIN")
+        conn.executemany(sql, batch)
+        conn.commit()
+        n += len(batch)
+    return n
+
+
+def round_robin(team_ids, rounds, rng):
+    # Circle method: every team once per round; the second time through, home and away swap
+    teams = team_ids[:]
+    rng.shuffle(teams)
+    if len(teams) % 2:
+        teams.append(None)  # bye
+    n = len(teams)
+    draw = []
+    for r in range(rounds):
+        cycle, k = divmod(r, n - 1)
+        order = [teams[0]] + teams[1:][k:] + teams[1:][:k]
+        pairs = [(order[i], order[n - 1 - i]) for i in range(n // 2)]
+        pairs = [(a, h) if (cycle + i + k) % 2 else (h, a) for i, (h, a) in enumerate(pairs)]
+        draw.append([(h, a) for h, a in pairs if h is not None and a is not None])
+    return draw
+
+
+def play(rng, strength, home, away):
+    # Expected margin from the strength gap plus home advantage; rugby-ish totals
+    margin = round(rng.gauss(strength[home] - strength[away] + 3, 12))
+    loser = max(0, round(rng.gauss(17, 7)))
+    return (loser + margin, loser) if margin >= 0 else (loser, loser - margin)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("db", help="SQLite file to create")
+    ap.add_argument("--users", type=int, default=10_000)
+    ap.add_argument("--rounds", type=int, default=18)
+    ap.add_argument("--played", type=int, help="completed rounds (default: two thirds); the next one is open")
+    ap.add_argument("--groups", type=int, help="number of groups (default: users / 25)")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--start", type=date.fromisoformat,
+                    help="round 1 deadline date (default: so the open round closes this coming Saturday)")
+    ap.add_argument("--password", default="password", help="password for every generated user")
+    ap.add_argument("--force", action="store_true", help="replace the file if it exists")
+    args = ap.parse_args()
+    played = min(args.rounds, args.played if args.played is not None else args.rounds * 2 // 3)
+    n_groups = args.groups if args.groups is not None else args.users // 25
+    if args.start is None:
+        today = date.today()
+        args.start = today + timedelta(days=(5 - today.weekday()) % 7) - timedelta(weeks=played)
+
+    if os.path.exists(args.db):
+        if not args.force:
+            sys.exit(f"{args.db} exists; use --force to replace it")
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(args.db + suffix):
+                os.remove(args.db + suffix)
+    os.environ["DB_PATH"] = os.path.abspath(args.db)
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import server
+
+    rng = random.Random(args.seed)
+    started = time.monotonic()
+    timings = {}
+
+    def phase(name, t0):
+        timings[name] = round(time.monotonic() - t0, 2)
+        print(f"  {name}: {timings[name]}s", file=sys.stderr)
+
+    server.init_db()
+    with server.db() as conn:
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute("PRAGMA cache_size=-262144")  # 256 MiB
+        team_ids = [r["id"] for r in conn.execute("SELECT id FROM teams ORDER BY id")]
+        strength = {t: rng.gauss(0, 8) for t in team_ids}
+        deadlines = [datetime.combine(args.start + timedelta(weeks=r), dtime(13, 0)) for r in range(args.rounds)]
+
+        # Users: fav teams follow team strength (bandwagons), signups spread over the preseason
+        t0 = time.monotonic()
+        password_hash = server.hash_password(args.password, salt=f"{rng.getrandbits(64):016x}")
+        fav_weights = [math.exp(strength[t] / 8) for t in team_ids]
+        profiles = []  # (engagement, fav_team, skill) per user, in id order
+
+        def users():
+            for i in range(args.users):
+                fav = rng.choices(team_ids, fav_weights)[0]
+                profiles.append((rng.betavariate(2, 1.2), fav, rng.betavariate(2, 2)))
+                signup = deadlines[0] - timedelta(days=rng.uniform(0, 60))
+                yield (f"user{i}@example.com", f"{rng.choice(FIRST)} {rng.choice(LAST)}", password_hash, fav,
+                       signup.strftime("%Y-%m-%d %H:%M:%S"))
+        insert(conn, "INSERT INTO users (email, display_name, password_hash, fav_team_id, created_at) "
+                     "VALUES (?,?,?,?,?)", users())
+        user_ids = [r[0] for r in conn.execute("SELECT id FROM users WHERE is_admin=0 ORDER BY id")]
+        phase("users", t0)
+
+        # Rounds and fixtures, with scores for the played rounds
+        t0 = time.monotonic()
+        conn.execute("BEGIN")
+        fixtures = []  # (fixture_id, round_index, home, away, expected home margin)
+        for r, pairs in enumerate(round_robin(team_ids, args.rounds, rng)):
+            status = "completed" if r < played else "open" if r == played else "upcoming"
+            rid = conn.execute("INSERT INTO rounds (round_number, name, deadline, status) VALUES (?,?,?,?)",
+                               (r + 1, f"Round {r + 1}", deadlines[r].isoformat(timespec="minutes"),
+                                status)).lastrowid
+            for k, (home, away) in enumerate(pairs):
+                kickoff = (deadlines[r] + timedelta(hours=1, minutes=30 * (k % 2)))
+                hs, as_ = play(rng, strength, home, away) if r < played else (None, None)
+                fid = conn.execute(
+                    "INSERT INTO fixtures (round_id, home_team_id, away_team_id, home_score, away_score, venue, "
+                    "kickoff, status) VALUES (?,?,?,?,?,?,?,?)",
+                    (rid, home, away, hs, as_, "Home ground", kickoff.isoformat(timespec="minutes"),
+                     "completed" if r < played else "upcoming")).lastrowid
+                fixtures.append((fid, r, home, away, strength[home] - strength[away] + 3))
+        conn.commit()
+        phase("rounds", t0)
+
+        # Tips, user by user so the (user_id, fixture_id) index is appended in order
+        t0 = time.monotonic()
+        tippable = [f for f in fixtures if f[1] <= played]
+
+        def tips():
+            for uid, (engagement, fav, skill) in zip(user_ids, profiles):
+                tipped_round = {}
+                for fid, r, home, away, expected in tippable:
+                    if r not in tipped_round:
+                        # The open round is only part way through its tipping week
+                        tipped_round[r] = rng.random() < engagement * (0.6 if r == played else 1)
+                    if not tipped_round[r] or rng.random() < 0.05:
+                        continue
+                    if fav in (home, away) and rng.random() < 0.8:
+                        winner = fav
+                    else:
+                        p_home = 1 / (1 + math.exp(-expected * skill / 6))
+                        winner = home if rng.random() < p_home else away
+                    confident = abs(expected) > 10
+                    margin = rng.choices((0, 7, 20), (3, 45, 52) if confident else (4, 70, 26))[0]
+                    at = deadlines[r] - timedelta(hours=min(144, rng.expovariate(1 / 14)))
+                    yield uid, fid, winner, margin, at.strftime("%Y-%m-%d %H:%M:%S")
+        n_tips = insert(conn, "INSERT INTO tips (user_id, fixture_id, predicted_winner_id, predicted_margin, "
+                              "created_at) VALUES (?,?,?,?,?)", tips())
+        phase("tips", t0)
+
+        # Groups: mostly small, a few big ones (Pareto sizes); the creator is the first member
+        t0 = time.monotonic()
+        codes = set()
+        memberships = []
+        conn.execute("BEGIN")
+        for g in range(n_groups):
+            code = "".join(rng.choices(CODE_CHARS, k=6))
+            while code in codes:
+                code = "".join(rng.choices(CODE_CHARS, k=6))
+            codes.add(code)
+            size = min(len(user_ids), max(2, int(rng.paretovariate(1.3) * 4)))
+            members = rng.sample(user_ids, size)
+            gid = conn.execute("INSERT INTO groups_ (name, code, created_by, created_at) VALUES (?,?,?,?)",
+                               (f"{rng.choice(GROUP_WORDS)} {g + 1}", code, members[0],
+                                (deadlines[0] - timedelta(days=rng.uniform(0, 30))).strftime("%Y-%m-%d %H:%M:%S"))
+                               ).lastrowid
+            memberships += [(gid, uid) for uid in members]
+        conn.commit()
+        memberships.sort(key=lambda m: (m[1], m[0]))
+        n_members = insert(conn, "INSERT INTO group_members (group_id, user_id) VALUES (?,?)", memberships)
+        phase("groups", t0)
+
+        # Score the played rounds and rebuild the derived tables
+        t0 = time.monotonic()
+        conn.execute("BEGIN")
+        for r in range(played):
+            ids = [f[0] for f in fixtures if f[1] == r]
+            conn.execute(server.SCORE_TIPS_SQL.format(marks=",".join("?" * len(ids))), ids)
+        server.rebuild_totals(conn)
+        server.recount_group_members(conn)
+        server.rebuild_round_scores(conn)
+        server.rebuild_standings(conn)
+        conn.commit()
+        phase("scoring", t0)
+        conn.execute("PRAGMA optimize")
+    server.pool.close_all()
+
+    print(json.dumps({
+        "db": args.db,
+        "seed": args.seed,
+        "start": args.start.isoformat(),
+        "users": len(user_ids),
+        "rounds": args.rounds,
+        "played": played,
+        "fixtures": len(fixtures),
+        "tips": n_tips,
+        "groups": n_groups,
+        "memberships": n_members,
+        "seconds": round(time.monotonic() - started, 1),
+        "phases": timings,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Mixed-traffic load test.
+
+Starts server.py against a throwaway database and seeds a season through
+the API: users, completed rounds with tips and results, and an open round
+whose deadline falls just after the run. Client threads then drive the
+match-week mix (leaderboard/fixture/round reads, tip submissions that surge
+towards the deadline, logins, and admin result entry). Throughput and
+p50/p95/p99 latency per route are printed as JSON, tagged with the current
+commit, so runs can be compared.
+
+    python3 bench/loadtest.py [--clients 32] [--seconds 20] [--users 200] [--mode asyncio]
+"""
+
+import argparse, http.client, json, os, random, socket, subprocess, sys, tempfile, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ADMIN = {"email": "admin@cmkrugby.co.nz", "password": "admin123"}
+PASSWORD = "loadtest"
+
+# route -> relative weight; POST /api/tips also ramps up towards the deadline
+MIX = {
+    "GET /api/leaderboard": 30,
+    "GET /api/fixtures/round/:id": 20,
+    "GET /api/rounds": 10,
+    "GET /api/tips/round/:id": 10,
+    "POST /api/tips": 15,
+    "POST /api/login": 3,
+    "PUT /api/admin/fixtures/:id/result": 1,
+}
+DEADLINE_SURGE = 3  # tip weight grows to (1 + DEADLINE_SURGE)x by the end of the run
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(db_path, port, env):
+    env = {**os.environ, "DB_PATH": db_path, "PORT": str(port), **env}
+    proc = subprocess.Popen([sys.executable, os.path.join(ROOT, "server.py")], env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("server did not start")
+
+
+class Client:
+    """One keep-alive connection; reconnects when the server closes it."""
+
+    def __init__(self, port, token=None):
+        self.port, self.token = port, token
+        self.conn = None
+
+    def request(self, method, path, body=None):
+        headers = {"Content-Type": "application/json"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        payload = json.dumps(body) if body is not None else None
+        for attempt in (0, 1):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=30)
+            try:
+                self.conn.request(method, path, payload, headers)
+                resp = self.conn.getresponse()
+                data = resp.read()
+                if resp.getheader("Connection", "").lower() == "close":
+                    self.close()
+                return resp.status, data
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                self.close()  # keep-alive connection went away between requests
+                if attempt:
+                    raise
+
+    def json(self, method, path, body=None):
+        status, data = self.request(method, path, body)
+        if status >= 400:
+            raise RuntimeError(f"{method} {path}: {status} {data[:200]!r}")
+        return json.loads(data)
+
+    def close(self):
+        if self.conn:
+            self.conn.close()
+        self.conn = None
+
+
+def register(port, i, team_ids):
+    client = Client(port)
+    body = {"email": f"user{i}@loadtest.nz", "display_name": f"Load User {i}",
+            "password": PASSWORD, "fav_team_id": team_ids[i % len(team_ids)]}
+    while True:
+        status, data = client.request("POST", "/api/register", body)
+        if status != 503:  # hashing slots full; wait our turn
+            break
+        time.sleep(0.05)
+    client.close()
+    if status != 200:
+        raise RuntimeError(f"register user{i}: {status}")
+    return json.loads(data)["token"]
+
+
+def random_tips(rng, fixtures):
+    return [{"fixture_id": f["id"], "predicted_winner_id": rng.choice((f["home_team_id"], f["away_team_id"])),
+             "predicted_margin": rng.choice((0, 7, 20))} for f in fixtures]
+
+
+def seed(port, args, rng):
+    admin = Client(port, Client(port).json("POST", "/api/login", ADMIN)["token"])
+    teams = [t["id"] for t in admin.json("GET", "/api/teams")]
+    with ThreadPoolExecutor(8) as ex:
+        tokens = list(ex.map(lambda i: register(port, i, teams), range(args.users)))
+
+    deadline = (datetime.now() + timedelta(seconds=args.seconds + 60)).isoformat(timespec="seconds")
+    rounds = []
+    for n in range(1, args.rounds + 1):
+        rid = admin.json("POST", "/api/admin/rounds", {
+            "round_number": n, "name": f"Round {n}", "deadline": deadline, "status": "open"})["id"]
+        shuffled = rng.sample(teams, len(teams))
+        for h, a in zip(shuffled[0::2], shuffled[1::2]):
+            admin.json("POST", "/api/admin/fixtures", {"round_id": rid, "home_team_id": h, "away_team_id": a,
+                                                       "venue": "Pukekura Park", "kickoff": deadline})
+        rounds.append((rid, admin.json("GET", f"/api/fixtures/round/{rid}")))
+
+    # Every round but the last is played out: most users tip, then results go in
+    with ThreadPoolExecutor(8) as ex:
+        for rid, fixtures in rounds[:-1]:
+            tippers = [t for t in tokens if rng.random() < 0.85]
+            list(ex.map(lambda t, f=fixtures: Client(port, t).json("POST", "/api/tips", {"tips": random_tips(rng, f)}),
+                        tippers))
+            admin.json("PUT", f"/api/admin/rounds/{rid}", {"status": "completed"})
+            admin.json("PUT", f"/api/admin/rounds/{rid}/results", {"results": [
+                {"fixture_id": f["id"], "home_score": rng.randint(0, 45), "away_score": rng.randint(0, 45)}
+                for f in fixtures]})
+    admin.close()
+    return tokens, rounds
+
+
+def percentile(sorted_ms, p):
+    if not sorted_ms:
+        return None
+    k = max(0, min(len(sorted_ms) - 1, round(p / 100 * len(sorted_ms) + 0.5) - 1))  # nearest rank
+    return round(sorted_ms[k], 2)
+
+
+def drive(port, args, tokens, rounds, admin_token):
+    open_rid, open_fixtures = rounds[-1]
+    played = [f for _, fixtures in rounds[:-1] for f in fixtures]
+    routes = list(MIX)
+    samples = {r: [] for r in routes}
+    statuses = {r: {} for r in routes}
+    lock = threading.Lock()
+    start = time.monotonic()
+    stop = start + args.seconds
+
+    def worker(seed):
+        rng = random.Random(seed)
+        user = Client(port, rng.choice(tokens))
+        admin = Client(port, admin_token)
+        local = {r: [] for r in routes}
+        codes = {r: {} for r in routes}
+        while (now := time.monotonic()) < stop:
+            phase = (now - start) / args.seconds
+            weights = [MIX[r] * (1 + DEADLINE_SURGE * phase if r == "POST /api/tips" else 1) for r in routes]
+            route = rng.choices(routes, weights)[0]
+            rid = rng.choice(rounds)[0]
+            client, body = user, None
+            if route == "GET /api/leaderboard":
+                method, path = "GET", "/api/leaderboard"
+            elif route == "GET /api/fixtures/round/:id":
+                method, path = "GET", f"/api/fixtures/round/{rid}"
+            elif route == "GET /api/rounds":
+                method, path = "GET", "/api/rounds"
+            elif route == "GET /api/tips/round/:id":
+                method, path = "GET", f"/api/tips/round/{open_rid}"
+            elif route == "POST /api/tips":
+                method, path, body = "POST", "/api/tips", {"tips": random_tips(rng, open_fixtures)}
+            elif route == "POST /api/login":
+                i = rng.randrange(len(tokens))
+                client = Client(port)  # a fresh visitor, not a keep-alive regular
+                method, path, body = "POST", "/api/login", {"email": f"user{i}@loadtest.nz", "password": PASSWORD}
+            else:
+                f = rng.choice(played)
+                client = admin
+                method, path = "PUT", f"/api/admin/fixtures/{f['id']}/result"
+                body = {"home_score": rng.randint(0, 45), "away_score": rng.randint(0, 45)}
+            t0 = time.perf_counter()
+            try:
+                status, _ = client.request(method, path, body)
+            except OSError:
+                status = "error"
+            local[route].append((time.perf_counter() - t0) * 1000)
+            codes[route][str(status)] = codes[route].get(str(status), 0) + 1
+            if client not in (user, admin):
+                client.close()
+        user.close()
+        admin.close()
+        with lock:
+            for r in routes:
+                samples[r] += local[r]
+                for code, n in codes[r].items():
+                    statuses[r][code] = statuses[r].get(code, 0) + n
+
+    threads = [threading.Thread(target=worker, args=(args.seed * 1000 + i,)) for i in range(args.clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - start
+
+    report = {}
+    for r in routes:
+        ms = sorted(samples[r])
+        report[r] = {
+            "requests": len(ms),
+            "rps": round(len(ms) / elapsed, 1),
+            "status": statuses[r],
+            "p50_ms": percentile(ms, 50),
+            "p95_ms": percentile(ms, 95),
+            "p99_ms": percentile(ms, 99),
+            "max_ms": round(ms[-1], 2) if ms else None,
+        }
+    total = sum(len(s) for s in samples.values())
+    errors = sum(n for st in statuses.values() for code, n in st.items() if code == "error" or int(code) >= 500)
+    return {"seconds": round(elapsed, 2), "requests": total, "rps": round(total / elapsed, 1),
+            "errors": errors, "routes": report}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--clients", type=int, default=32, help="concurrent client threads")
+    ap.add_argument("--seconds", type=float, default=20)
+    ap.add_argument("--users", type=int, default=200)
+    ap.add_argument("--rounds", type=int, default=6, help="rounds seeded; all but the last are completed")
+    ap.add_argument("--mode", choices=("threads", "asyncio"), default="threads", help="SERVER_MODE")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--out", help="also write the JSON report here")
+    args = ap.parse_args()
+    rng = random.Random(args.seed)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        port = free_port()
+        proc = start_server(os.path.join(tmp, "loadtest.db"), port, {"SERVER_MODE": args.mode})
+        try:
+            t0 = time.monotonic()
+            tokens, rounds = seed(port, args, rng)
+            print(f"  seeded {args.users} users, {args.rounds} rounds in {time.monotonic() - t0:.1f}s",
+                  file=sys.stderr)
+            admin_token = Client(port).json("POST", "/api/login", ADMIN)["token"]
+            result = drive(port, args, tokens, rounds, admin_token)
+        finally:
+            proc.terminate()
+            proc.wait()
+
+    report = {
+        "commit": git_commit(),
+        "config": {"mode": args.mode, "clients": args.clients, "seconds": args.seconds,
+                   "users": args.users, "rounds": args.rounds, "seed": args.seed},
+        **result,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
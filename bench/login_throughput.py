@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Login throughput vs. hashing processes.
+
+Starts server.py against a throwaway database once per AUTH_PROCESSES value
+and hammers POST /api/login from concurrent clients, then prints logins/sec
+for each process count as JSON.
+
+    python3 bench/login_throughput.py [--clients 16] [--seconds 5] [--max-procs N]
+"""
+
+import argparse, http.client, json, os, socket, subprocess, sys, tempfile, threading, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOGIN = json.dumps({"email": "admin@cmkrugby.co.nz", "password": "admin123"})
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(db_path, port, env):
+    env = {**os.environ, "DB_PATH": db_path, "PORT": str(port), **env}
+    proc = subprocess.Popen([sys.executable, os.path.join(ROOT, "server.py")], env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("server did not start")
+
+
+def hammer(port, clients, seconds):
+    counts = {"ok": 0, "busy": 0, "error": 0}
+    lock = threading.Lock()
+    stop = time.monotonic() + seconds
+
+    def client():
+        local = {"ok": 0, "busy": 0, "error": 0}
+        while time.monotonic() < stop:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            try:
+                conn.request("POST", "/api/login", LOGIN, {"Content-Type": "application/json"})
+                status = conn.getresponse().status
+                local["ok" if status == 200 else "busy" if status == 503 else "error"] += 1
+            except OSError:
+                local["error"] += 1
+            finally:
+                conn.close()
+        with lock:
+            for k, v in local.items():
+                counts[k] += v
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return counts
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--clients", type=int, default=16)
+    ap.add_argument("--seconds", type=float, default=5)
+    ap.add_argument("--max-procs", type=int, default=os.cpu_count() or 1)
+    args = ap.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for procs in range(1, args.max_procs + 1):
+            port = free_port()
+            proc = start_server(os.path.join(tmp, "bench.db"), port,
+                                {"AUTH_PROCESSES": str(procs), "AUTH_CONCURRENCY": str(args.clients)})
+            try:
+                hammer(port, procs, 1)  # spin up the hashing processes
+                counts = hammer(port, args.clients, args.seconds)
+            finally:
+                proc.terminate()
+                proc.wait()
+            results.append({"processes": procs, "clients": args.clients,
+                            "logins_per_sec": round(counts["ok"] / args.seconds, 1), **counts})
+            print(f"  {procs} process(es): {results[-1]['logins_per_sec']} logins/s", file=sys.stderr)
+    print(json.dumps({"cpu_count": os.cpu_count(), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Routing cost per request: the compiled Router vs. the old dispatch, which
+rebuilt a dict per request and then tried re.match patterns in turn.
+
+Times a lookup of every API route (plus a miss per method) and prints
+nanoseconds per lookup as JSON.
+
+    python3 bench/routing.py [--rounds 20000]
+"""
+
+import argparse, json, os, re, sys, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import server
+
+REQUESTS = [
+    ("GET", "/api/me"), ("GET", "/api/teams"), ("GET", "/api/rounds"), ("GET", "/api/fixtures"),
+    ("GET", "/api/leaderboard"), ("GET", "/api/groups"), ("GET", "/api/admin/users"),
+    ("GET", "/api/fixtures/round/7"), ("GET", "/api/tips/round/7"), ("GET", "/api/groups/12/leaderboard"),
+    ("POST", "/api/register"), ("POST", "/api/login"), ("POST", "/api/tips"), ("POST", "/api/groups/create"),
+    ("POST", "/api/groups/join"), ("POST", "/api/admin/rounds"), ("POST", "/api/admin/fixtures"),
+    ("POST", "/api/admin/teams"),
+    ("PUT", "/api/admin/rounds/3"), ("PUT", "/api/admin/fixtures/41/result"), ("PUT", "/api/admin/teams/2"),
+    ("PUT", "/api/admin/users/9/toggle-admin"),
+    ("DELETE", "/api/admin/teams/2"), ("DELETE", "/api/admin/users/9"),
+    ("GET", "/api/nope"), ("POST", "/api/nope"), ("PUT", "/api/nope"), ("DELETE", "/api/nope"),
+]
+
+
+def f(*args):
+    return args
+
+
+def legacy(method, path):
+    # The pre-router do_GET/do_POST/do_PUT/do_DELETE bodies, minus the handler calls
+    if method == "GET":
+        routes = {"/api/me": f, "/api/teams": f, "/api/rounds": f, "/api/fixtures": f,
+                  "/api/leaderboard": f, "/api/groups": f, "/api/admin/users": f}
+        if path in routes:
+            return routes[path]
+        for pattern in (r"/api/fixtures/round/(\d+)", r"/api/tips/round/(\d+)", r"/api/groups/(\d+)/leaderboard"):
+            m = re.match(pattern, path)
+            if m:
+                return f, int(m.group(1))
+        return None
+    if method == "POST":
+        routes = {"/api/register": f, "/api/login": f, "/api/tips": f, "/api/groups/create": f,
+                  "/api/groups/join": f, "/api/admin/rounds": f, "/api/admin/fixtures": f, "/api/admin/teams": f}
+        return routes.get(path)
+    if method == "PUT":
+        for pattern in (r"/api/admin/rounds/(\d+)", r"/api/admin/fixtures/(\d+)/result",
+                        r"/api/admin/teams/(\d+)", r"/api/admin/users/(\d+)/toggle-admin"):
+            m = re.match(pattern, path)
+            if m:
+                return f, int(m.group(1))
+        return None
+    for pattern in (r"/api/admin/teams/(\d+)", r"/api/admin/users/(\d+)"):
+        m = re.match(pattern, path)
+        if m:
+            return f, int(m.group(1))
+    return None
+
+
+def compiled(method, path):
+    methods, params = server.routes.match(path)
+    return methods and methods.get(method), params
+
+
+def bench(fn, rounds):
+    start = time.perf_counter_ns()
+    for _ in range(rounds):
+        for method, path in REQUESTS:
+            fn(method, path)
+    return (time.perf_counter_ns() - start) / (rounds * len(REQUESTS))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rounds", type=int, default=20000)
+    args = ap.parse_args()
+    bench(legacy, 100)
+    bench(compiled, 100)
+    old, new = bench(legacy, args.rounds), bench(compiled, args.rounds)
+    print(json.dumps({
+        "lookups": args.rounds * len(REQUESTS),
+        "legacy_ns_per_lookup": round(old),
+        "router_ns_per_lookup": round(new),
+        "speedup": round(old / new, 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
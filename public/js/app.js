@@ -86,6 +86,8 @@ function handleAuth(data) {
 }
 
 document.getElementById('btn-logout').addEventListener('click', () => {
+  closeStream();
+  if (token) api('/api/logout', { method: 'POST' }).catch(() => {});
   token = null; currentUser = null;
   localStorage.removeItem('cmk_token');
   appEl.classList.add('hidden');
@@ -123,6 +125,7 @@ async function loadData() {
   renderRoundBar();
   loadLeaderboard();
   loadGroups();
+  openStream();
 }
 
 // ── Navigation ──
@@ -167,14 +170,7 @@ async function selectRound(round) {
   selectedRound = round;
   tipState = {};
   renderRoundBar();
-
-  const strip = document.getElementById('round-strip');
-  strip.classList.remove('hidden');
-  document.getElementById('round-title').textContent = round.name;
-  const badge = document.getElementById('round-badge');
-  badge.textContent = round.status;
-  badge.className = `status-badge status-${round.status}`;
-  document.getElementById('round-deadline').textContent = 'Deadline: ' + formatDate(round.deadline);
+  renderRoundStrip(round);
 
   const fixtures = await api(`/api/fixtures/round/${round.id}`);
   let existing = [];
@@ -186,6 +182,16 @@ async function selectRound(round) {
   renderFixtures(fixtures, round);
 }
 
+function renderRoundStrip(round) {
+  const strip = document.getElementById('round-strip');
+  strip.classList.remove('hidden');
+  document.getElementById('round-title').textContent = round.name;
+  const badge = document.getElementById('round-badge');
+  badge.textContent = round.status;
+  badge.className = `status-badge status-${round.status}`;
+  document.getElementById('round-deadline').textContent = 'Deadline: ' + formatDate(round.deadline);
+}
+
 function marginNumToCategory(n) {
   if (n === 0) return 'draw';
   if (n <= 12) return '1-12';
@@ -310,42 +316,68 @@ document.getElementById('btn-submit').addEventListener('click', async () => {
     predicted_margin: marginCategoryToNum(t.margin)
   }));
   try {
-    await api('/api/tips', { method: 'POST', body: JSON.stringify({ tips }) });
-    showToast('Tips locked in!');
+    const res = await api('/api/tips', { method: 'POST', body: JSON.stringify({ tips }) });
+    if (res.rejected && res.rejected.length) {
+      showToast(`${res.accepted.length} locked in, ${res.rejected.length} rejected: ${res.rejected[0].reason}`);
+    } else {
+      showToast('Tips locked in!');
+    }
   } catch (err) { showToast('Error: ' + err.message); }
 });
 
 // ── Leaderboard ──
-async function loadLeaderboard() {
-  const rows = await api('/api/leaderboard');
-  const me = rows.find(r => r.id === currentUser.id);
-
-  document.getElementById('my-stats').innerHTML = `
-    <div class="stat-card"><div class="stat-num">${me ? me.total_points : 0}</div><div class="stat-label">Your Points</div></div>
-    <div class="stat-card"><div class="stat-num">${me ? (me.correct_tips || 0) : 0}</div><div class="stat-label">Correct Tips</div></div>
-    <div class="stat-card"><div class="stat-num">${me ? (me.total_tips || 0) : 0}</div><div class="stat-label">Total Tips</div></div>
-    <div class="stat-card"><div class="stat-num">${me ? (rows.indexOf(me) + 1) : '–'}</div><div class="stat-label">Your Rank</div></div>
-  `;
-
-  document.getElementById('lb-table').innerHTML = rows.length === 0
-    ? '<div class="empty-state"><div class="empty-icon">🏆</div><p>No tips submitted yet.</p></div>'
-    : rows.map((r, i) => `
-      <div class="lb-row ${i < 3 ? 'top-3' : ''} ${r.id === currentUser.id ? 'is-me' : ''}">
-        <div class="lb-pos">${i < 3 ? ['🥇','🥈','🥉'][i] : i + 1}</div>
+// Pages of 50 in rank order; "Show more" follows the server's cursor
+let lbCursor = null;
+
+function lbRowHTML(r) {
+  const me = r.id === currentUser.id;
+  return `
+      <div class="lb-row ${r.rank <= 3 ? 'top-3' : ''} ${me ? 'is-me' : ''}">
+        <div class="lb-pos">${r.rank <= 3 ? ['🥇','🥈','🥉'][r.rank - 1] : r.rank}</div>
         <div class="lb-user-info">
-          <div class="lb-username">${r.display_name}${r.id === currentUser.id ? ' <span style="color:var(--blue);font-size:0.7rem">(you)</span>' : ''}</div>
+          <div class="lb-username">${r.display_name}${me ? ' <span style="color:var(--blue);font-size:0.7rem">(you)</span>' : ''}</div>
         </div>
         <div class="lb-stats">
           <div class="lb-stat-item"><div class="lb-stat-val">${r.correct_tips || 0}/${r.total_tips || 0}</div><div class="lb-stat-label">Correct</div></div>
           <div class="lb-stat-item"><div class="lb-stat-val primary">${r.total_points}</div><div class="lb-stat-label">Points</div></div>
         </div>
       </div>
-    `).join('');
+    `;
+}
+
+async function loadLeaderboard(more = false) {
+  const [page, mine] = await Promise.all([
+    api(`/api/leaderboard?limit=50${more && lbCursor ? `&cursor=${lbCursor}` : ''}`),
+    more ? null : api('/api/leaderboard/me?around=0').catch(() => null)
+  ]);
+  lbCursor = page.next_cursor;
+  document.getElementById('lb-more').classList.toggle('hidden', !lbCursor);
+
+  if (!more) {
+    const me = mine && mine.me;
+    document.getElementById('my-stats').innerHTML = `
+      <div class="stat-card"><div class="stat-num">${me ? me.total_points : 0}</div><div class="stat-label">Your Points</div></div>
+      <div class="stat-card"><div class="stat-num">${me ? (me.correct_tips || 0) : 0}</div><div class="stat-label">Correct Tips</div></div>
+      <div class="stat-card"><div class="stat-num">${me ? (me.total_tips || 0) : 0}</div><div class="stat-label">Total Tips</div></div>
+      <div class="stat-card"><div class="stat-num">${me ? me.rank : '–'}</div><div class="stat-label">Your Rank</div></div>
+    `;
+  }
+
+  const table = document.getElementById('lb-table');
+  if (!more && page.rows.length === 0) {
+    table.innerHTML = '<div class="empty-state"><div class="empty-icon">🏆</div><p>No tips submitted yet.</p></div>';
+    return;
+  }
+  const html = page.rows.map(lbRowHTML).join('');
+  if (more) table.insertAdjacentHTML('beforeend', html);
+  else table.innerHTML = html;
 }
 
+document.getElementById('lb-more').addEventListener('click', () => loadLeaderboard(true));
+
 // ── Groups ──
 async function loadGroups() {
-  const groups = await api('/api/groups');
+  const groups = await api('/api/groups/leaderboards?top=1');
   const grid = document.getElementById('groups-grid');
   const lbSec = document.getElementById('group-lb-section');
   lbSec.classList.add('hidden');
@@ -357,7 +389,7 @@ async function loadGroups() {
     ? '<div class="empty-state"><div class="empty-icon">👥</div><p>No groups yet. Create one and share the code!</p></div>'
     : groups.map(g => `
       <div class="group-card" data-gid="${g.id}" data-gname="${g.name}" data-gcode="${g.code}">
-        <div><div class="group-name">${g.name}</div><div class="group-meta">${g.member_count} member${g.member_count !== 1 ? 's' : ''}</div></div>
+        <div><div class="group-name">${g.name}</div><div class="group-meta">${g.member_count} member${g.member_count !== 1 ? 's' : ''}${groupStanding(g)}</div></div>
         <span class="group-code">${g.code}</span>
       </div>
     `).join('');
@@ -367,6 +399,13 @@ async function loadGroups() {
   });
 }
 
+function groupStanding(g) {
+  const leader = g.rows[0];
+  if (!leader || !leader.total_points) return '';
+  const me = g.me && g.me.id !== leader.id ? ` · you're #${g.me.rank}` : '';
+  return ` · ${leader.id === currentUser.id ? 'you lead' : `${leader.display_name} leads`} on ${leader.total_points}${me}`;
+}
+
 async function showGroupLB(id, name, code) {
   document.getElementById('groups-grid').style.display = 'none';
   document.querySelector('#sec-groups .page-header').style.display = 'none';
@@ -376,21 +415,28 @@ async function showGroupLB(id, name, code) {
   document.getElementById('group-lb-title').textContent = name;
   document.getElementById('group-lb-code').textContent = code;
 
-  const rows = await api(`/api/groups/${id}/leaderboard`);
-  document.getElementById('group-lb-table').innerHTML = rows.length === 0
-    ? '<div class="empty-state"><p>No members yet.</p></div>'
-    : rows.map((r, i) => `
-      <div class="lb-row ${i < 3 ? 'top-3' : ''}">
-        <div class="lb-pos">${i < 3 ? ['🥇','🥈','🥉'][i] : i + 1}</div>
-        <div class="lb-user-info"><div class="lb-username">${r.display_name}</div></div>
-        <div class="lb-stats">
-          <div class="lb-stat-item"><div class="lb-stat-val">${r.correct_tips || 0}/${r.total_tips || 0}</div><div class="lb-stat-label">Correct</div></div>
-          <div class="lb-stat-item"><div class="lb-stat-val primary">${r.total_points}</div><div class="lb-stat-label">Points</div></div>
-        </div>
-      </div>
-    `).join('');
+  groupLB = { id, cursor: null };
+  await loadGroupLBPage(false);
+}
+
+let groupLB = null;
+
+async function loadGroupLBPage(more) {
+  const page = await api(`/api/groups/${groupLB.id}/leaderboard?limit=50${more && groupLB.cursor ? `&cursor=${groupLB.cursor}` : ''}`);
+  groupLB.cursor = page.next_cursor;
+  document.getElementById('group-lb-more').classList.toggle('hidden', !groupLB.cursor);
+  const table = document.getElementById('group-lb-table');
+  if (!more && page.rows.length === 0) {
+    table.innerHTML = '<div class="empty-state"><p>No members yet.</p></div>';
+    return;
+  }
+  const html = page.rows.map(lbRowHTML).join('');
+  if (more) table.insertAdjacentHTML('beforeend', html);
+  else table.innerHTML = html;
 }
 
+document.getElementById('group-lb-more').addEventListener('click', () => loadGroupLBPage(true));
+
 document.getElementById('btn-back-groups').addEventListener('click', loadGroups);
 
 document.getElementById('btn-create-group').addEventListener('click', async () => {
@@ -413,6 +459,45 @@ document.getElementById('btn-join-group').addEventListener('click', async () =>
   } catch (err) { alert(err.message); }
 });
 
+// ── Live updates ──
+// The server pushes results, round changes and leaderboard moves over SSE;
+// EventSource reconnects by itself if the stream drops.
+let stream = null;
+
+function openStream() {
+  if (stream || !window.EventSource) return;
+  stream = new EventSource('/api/stream');
+
+  stream.addEventListener('result', async e => {
+    const d = JSON.parse(e.data);
+    if (!selectedRound || selectedRound.id !== d.round_id) return;
+    renderFixtures(await api(`/api/fixtures/round/${d.round_id}`), selectedRound);
+  });
+
+  stream.addEventListener('round', async e => {
+    const round = JSON.parse(e.data);
+    const i = allRounds.findIndex(r => r.id === round.id);
+    if (i >= 0) allRounds[i] = round; else allRounds.push(round);
+    allRounds.sort((a, b) => a.round_number - b.round_number);
+    if (selectedRound && selectedRound.id === round.id) {
+      selectedRound = round;
+      renderRoundStrip(round);
+      renderFixtures(await api(`/api/fixtures/round/${round.id}`), round);
+    }
+    renderRoundBar();
+  });
+
+  stream.addEventListener('leaderboard', () => {
+    // Hidden tabs reload when opened anyway
+    if (document.getElementById('sec-leaderboard').classList.contains('active')) loadLeaderboard();
+  });
+}
+
+function closeStream() {
+  if (stream) stream.close();
+  stream = null;
+}
+
 // ── Helpers ──
 function formatDate(d) {
   if (!d) return '';
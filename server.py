@@ -4,84 +4,1107 @@ CMK Club Rugby Tipping — Taranaki
 Full-stack tipping web app: Python stdlib server + SQLite
 """
 
-import json, os, sqlite3, hashlib, hmac, secrets, time, re
-from http.server import HTTPServer, SimpleHTTPRequestHandler
-from urllib.parse import urlparse, parse_qs
+import json, os, sys, sqlite3, hashlib, hmac, secrets, time, re, queue, signal, threading
+import gzip, mimetypes, multiprocessing, asyncio, io, traceback, selectors, socket, bisect, csv
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs, unquote
 from datetime import datetime, timezone
 
-DB_PATH = os.path.join(os.path.dirname(__file__), "cmk_tipping.db")
-SECRET = secrets.token_hex(32)
+DB_PATH = os.environ.get("DB_PATH") or os.path.join(os.path.dirname(__file__), "cmk_tipping.db")
+SECRET = os.environ.get("SECRET_KEY")  # otherwise generated once and kept in the settings table
 PORT = int(os.environ.get("PORT", 3000))
+WORKERS = int(os.environ.get("WORKERS", 16))          # request worker threads
+QUEUE_DEPTH = int(os.environ.get("QUEUE_DEPTH", 64))  # accepted connections waiting for a worker
+SHUTDOWN_GRACE = 10                                   # seconds to let in-flight requests finish
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", WORKERS))
+DB_STATEMENT_CACHE = 256                              # prepared statements kept per connection
+PBKDF2_ITERATIONS = 100_000
+AUTH_PROCESSES = int(os.environ.get("AUTH_PROCESSES", os.cpu_count() or 1))
+# Logins/registrations hashing at once; beyond this they get a 503 so the
+# remaining workers stay free for tips and leaderboard reads
+AUTH_CONCURRENCY = int(os.environ.get("AUTH_CONCURRENCY", max(1, WORKERS // 2)))
+SESSION_TTL = int(os.environ.get("SESSION_TTL", 30 * 86400))  # seconds
+SESSION_CACHE_SIZE = 10_000                                  # verified sessions kept in memory
+LEADERBOARD_PAGE = 50                                        # rows per page unless ?limit= (max 200)
+LEADERBOARD_MAX_PAGE = 200
+RESPONSE_CACHE_BYTES = int(os.environ.get("RESPONSE_CACHE_BYTES", 8 * 1024 * 1024))
+KEEPALIVE_TIMEOUT = float(os.environ.get("KEEPALIVE_TIMEOUT", 5))      # idle seconds before closing
+KEEPALIVE_MAX_REQUESTS = int(os.environ.get("KEEPALIVE_MAX_REQUESTS", 100))
+KEEPALIVE_POLL = 0.05                                                  # idle check for queued connections
+SERVER_MODE = os.environ.get("SERVER_MODE", "threads")                # "threads" or "asyncio"
+ASYNC_MAX_CONNECTIONS = int(os.environ.get("ASYNC_MAX_CONNECTIONS", 10_000))
+MAX_HEADER_BYTES = 64 * 1024
+SSE_MAX_CLIENTS = int(os.environ.get("SSE_MAX_CLIENTS", 1000))  # open /api/stream connections
+SSE_HEARTBEAT = 15                                            # seconds between keep-alive comments
+SSE_CLIENT_BUFFER = 64 * 1024                                 # unsent bytes before a client is dropped
+SQL_PROFILE = os.environ.get("SQL_PROFILE") == "1"  # time every statement; also switchable at runtime
+SQL_SLOW_MS = float(os.environ.get("SQL_SLOW_MS", 50))
+SQL_SLOW_KEEP = 200                                   # slow statements kept in the ring buffer
+IMPORT_LINE_BYTES = 64 * 1024                         # longest CSV/NDJSON line a draw import accepts
+EXPORT_BATCH = 500                                    # rows per fetchmany() and per chunk in exports
+BACKUP_DIR = os.environ.get("BACKUP_DIR") or os.path.join(os.path.dirname(os.path.abspath(DB_PATH)), "backups")
+BACKUP_INTERVAL = float(os.environ.get("BACKUP_INTERVAL", 0))      # seconds between scheduled backups; 0 = off (e.g. 86400)
+BACKUP_RETRY = 60                                                # first retry after a failed backup, doubling up to the interval
+BACKUP_KEEP = int(os.environ.get("BACKUP_KEEP", 7))                # newest backups kept
+BACKUP_STEP_PAGES = 256                                          # pages copied per backup step
+BACKUP_STEP_PAUSE = 0.01                                         # seconds slept between steps
+METRIC_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)  # seconds
 
 # ── Helpers ──────────────────────────────────────────────────────────────
 
 def hash_password(pw, salt=None):
     salt = salt or secrets.token_hex(16)
-    h = hashlib.pbkdf2_hmac("sha256", pw.encode(), salt.encode(), 100_000)
+    h = hashlib.pbkdf2_hmac("sha256", pw.encode(), salt.encode(), PBKDF2_ITERATIONS)
     return salt + ":" + h.hex()
 
 def check_password(pw, stored):
     salt, _ = stored.split(":", 1)
-    return hash_password(pw, salt) == stored
+    return hmac.compare_digest(hash_password(pw, salt), stored)
 
-def make_token(user_id, is_admin):
-    payload = f"{user_id}:{is_admin}:{time.time()}"
-    sig = hmac.new(SECRET.encode(), payload.encode(), "sha256").hexdigest()
-    return payload + ":" + sig
+class AuthBusy(Exception):
+    pass
 
-def verify_token(token):
-    if not token:
-        return None
-    parts = token.rsplit(":", 1)
-    if len(parts) != 2:
-        return None
-    payload, sig = parts
-    expected = hmac.new(SECRET.encode(), payload.encode(), "sha256").hexdigest()
-    if not secrets.compare_digest(sig, expected):
-        return None
-    p = payload.split(":")
-    return {"user_id": int(p[0]), "is_admin": p[1] == "True"}
+# PBKDF2 is pure CPU and holds the GIL, so it runs in worker processes
+_auth_pool = None
+_auth_pool_lock = threading.Lock()
+_auth_slots = threading.BoundedSemaphore(AUTH_CONCURRENCY)
+
+def run_auth(fn, *args):
+    global _auth_pool
+    if not _auth_slots.acquire(blocking=False):
+        raise AuthBusy
+    try:
+        with _auth_pool_lock:
+            if _auth_pool is None:
+                _auth_pool = ProcessPoolExecutor(AUTH_PROCESSES, mp_context=multiprocessing.get_context("spawn"))
+        return _auth_pool.submit(fn, *args).result()
+    finally:
+        _auth_slots.release()
+
+def shutdown_auth_pool():
+    global _auth_pool
+    with _auth_pool_lock:
+        if _auth_pool:
+            _auth_pool.shutdown(cancel_futures=True)
+            _auth_pool = None
+
+class SessionStore:
+    """Sessions live in the sessions table and are handed out as signed
+    "<id>.<hmac>" tokens, so they survive restarts, expire and can be revoked.
+    Recently verified tokens are kept in a bounded LRU so repeat requests skip
+    the HMAC and the database lookup."""
+
+    def __init__(self, ttl=SESSION_TTL, cache_size=SESSION_CACHE_SIZE):
+        self.key = None
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self._cache = OrderedDict()  # token -> {"user_id", "is_admin", "expires_at"}
+        self._lock = threading.Lock()
+        self._generation = 0  # bumped on revoke so in-flight lookups don't re-cache
+        self._last_purge = 0
+        self.hits = 0
+        self.misses = 0
+
+    def load_key(self, conn):
+        row = conn.execute("SELECT value FROM settings WHERE key='session_key'").fetchone()
+        self.key = (SECRET or row["value"]).encode()
+
+    def _sign(self, sid):
+        return hmac.new(self.key, sid.encode(), "sha256").hexdigest()
+
+    def create(self, conn, user_id, is_admin):
+        now = time.time()
+        if now - self._last_purge > 3600:
+            self._last_purge = now
+            conn.execute("DELETE FROM sessions WHERE expires_at < ?", (now,))
+        sid = secrets.token_urlsafe(24)
+        conn.execute(
+            "INSERT INTO sessions (id, user_id, is_admin, created_at, expires_at) VALUES (?,?,?,?,?)",
+            (sid, user_id, int(is_admin), now, now + self.ttl)
+        )
+        conn.commit()
+        return sid + "." + self._sign(sid)
+
+    def verify(self, token):
+        if not token:
+            return None
+        now = time.time()
+        with self._lock:
+            session = self._cache.get(token)
+            if session and session["expires_at"] > now:
+                self._cache.move_to_end(token)
+                self.hits += 1
+                return session
+            self._cache.pop(token, None)
+            self.misses += 1
+            generation = self._generation
+        sid, _, sig = token.partition(".")
+        if not sig or not hmac.compare_digest(sig, self._sign(sid)):
+            return None
+        with db() as conn:
+            row = conn.execute("SELECT user_id, is_admin, expires_at FROM sessions WHERE id=?", (sid,)).fetchone()
+        if not row or row["expires_at"] <= now:
+            return None
+        session = {"user_id": row["user_id"], "is_admin": bool(row["is_admin"]), "expires_at": row["expires_at"]}
+        with self._lock:
+            if generation == self._generation:
+                self._cache[token] = session
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return session
+
+    # revoke() and set_admin() commit the caller's transaction before dropping
+    # cached entries, so a concurrent lookup can't re-cache the old row
+
+    def revoke(self, conn, token=None, user_id=None):
+        # Revoke one token, or every session a user has
+        if token:
+            conn.execute("DELETE FROM sessions WHERE id=?", (token.partition(".")[0],))
+        if user_id is not None:
+            conn.execute("DELETE FROM sessions WHERE user_id=?", (user_id,))
+        conn.commit()
+        self._forget(lambda t, s: t == token or s["user_id"] == user_id)
+
+    def set_admin(self, conn, user_id):
+        conn.execute("UPDATE sessions SET is_admin=(SELECT is_admin FROM users WHERE id=?) WHERE user_id=?",
+                     (user_id, user_id))
+        conn.commit()
+        self._forget(lambda t, s: s["user_id"] == user_id)
+
+    def _forget(self, match):
+        with self._lock:
+            self._generation += 1
+            for t in [t for t, s in self._cache.items() if match(t, s)]:
+                del self._cache[t]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "cached": len(self._cache),
+                "capacity": self.cache_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            }
+
+sessions = SessionStore()
+
+class ConnectionPool:
+    """Long-lived SQLite connections shared by the worker threads. PRAGMAs are
+    applied once when a connection is opened; checkout is a context manager
+    so a connection always goes back to the pool, rolled back if the caller
+    left a transaction open."""
+
+    def __init__(self, path, size=DB_POOL_SIZE, statement_cache=DB_STATEMENT_CACHE):
+        self.path = path
+        self.size = size
+        self.statement_cache = statement_cache
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.in_use = 0
+        self.high_water = 0
+        self.checkouts = 0
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, factory=TimedConnection,
+                               cached_statements=self.statement_cache)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        with self._lock:
+            self.opened += 1
+        return conn
+
+    @contextmanager
+    def connection(self):
+        start = time.perf_counter()
+        self._slots.acquire()
+        waited = time.perf_counter() - start
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            try:
+                conn = self._open()
+            except Exception:
+                self._slots.release()
+                raise
+        with self._lock:
+            self.checkouts += 1
+            self.wait_time += waited
+            self.max_wait = max(self.max_wait, waited)
+            self.in_use += 1
+            self.high_water = max(self.high_water, self.in_use)
+        try:
+            yield conn
+        finally:
+            try:
+                if conn.in_transaction:
+                    conn.rollback()
+                self._idle.put(conn)
+            except sqlite3.Error:
+                conn.close()  # broken connection; a fresh one is opened on demand
+                with self._lock:
+                    self.opened -= 1
+            with self._lock:
+                self.in_use -= 1
+            self._slots.release()
+
+    def close_all(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": self.size,
+                "open": self.opened,
+                "in_use": self.in_use,
+                "high_water": self.high_water,
+                "checkouts": self.checkouts,
+                "wait_ms_total": round(self.wait_time * 1000, 3),
+                "wait_ms_max": round(self.max_wait * 1000, 3),
+            }
+
+pool = ConnectionPool(DB_PATH)
 
 def db():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA journal_mode=WAL")
-    conn.execute("PRAGMA foreign_keys=ON")
-    return conn
+    return pool.connection()
 
-def json_response(handler, data, status=200):
+def json_response(handler, data, status=200, etag=None, headers=None):
+    start = time.perf_counter()
     body = json.dumps(data, default=str).encode()
+    clock.serialize += time.perf_counter() - start
+    send_json(handler, body, status, etag, headers)
+
+def send_json(handler, body, status=200, etag=None, headers=None):
     handler.send_response(status)
     handler.send_header("Content-Type", "application/json")
     handler.send_header("Content-Length", len(body))
+    if etag:
+        handler.send_header("ETag", etag)
+        handler.send_header("Cache-Control", "no-cache")
+    for k, v in (headers or {}).items():
+        handler.send_header(k, v)
     handler.end_headers()
     handler.wfile.write(body)
 
+class DataVersions:
+    """Change counters per data domain (teams, rounds, fixtures, leaderboard,
+    standings, tips).
+    Writes bump the domains they touch after committing; read endpoints build
+    their ETag from the domains they depend on, so a client that is already
+    current gets a 304 without touching the database."""
+
+    def __init__(self):
+        self.epoch = secrets.token_hex(4)  # counters restart at zero, tags must not repeat
+        self._counts = {}
+        self._lock = threading.Lock()
+        self.listeners = []  # called with the bumped domains
+
+    def bump(self, *domains):
+        with self._lock:
+            for d in domains:
+                self._counts[d] = self._counts.get(d, 0) + 1
+        for listener in self.listeners:
+            listener(domains)
+
+    def etag(self, *domains):
+        with self._lock:
+            counts = ".".join(str(self._counts.get(d, 0)) for d in domains)
+        return f'"{self.epoch}-{counts}"'
+
+versions = DataVersions()
+
+def check_etag(handler, *domains):
+    # Returns the ETag for a fresh response, or None after answering 304.
+    # Taken before the query runs, so the body is never older than its tag.
+    etag = versions.etag(*domains)
+    inm = handler.headers.get("If-None-Match")
+    if inm and (inm.strip() == "*" or etag in [t.strip().removeprefix("W/") for t in inm.split(",")]):
+        handler.send_response(304)
+        handler.send_header("ETag", etag)
+        handler.send_header("Cache-Control", "no-cache")
+        handler.end_headers()
+        return None
+    return etag
+
+class ResponseCache:
+    """Serialized JSON bodies of the public GET endpoints, keyed by route and
+    parameters, LRU-evicted past max_bytes. An entry is only served while its
+    ETag is still current; bumping a domain also drops its entries at once."""
+
+    def __init__(self, max_bytes=RESPONSE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries = OrderedDict()  # key -> (etag, domains, body)
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def get(self, key, etag):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == etag:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+            return None
+
+    def put(self, key, etag, domains, body):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if versions.etag(*domains) != etag:
+                return  # a write landed while this body was built
+            old = self._entries.pop(key, None)
+            if old:
+                self.bytes -= len(old[2])
+            self._entries[key] = (etag, set(domains), body)
+            self.bytes += len(body)
+            while self.bytes > self.max_bytes:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self.bytes -= len(evicted)
+                self.evictions += 1
+
+    def invalidate(self, domains):
+        with self._lock:
+            stale = [k for k, (_, deps, _) in self._entries.items() if deps.intersection(domains)]
+            for k in stale:
+                self.bytes -= len(self._entries.pop(k)[2])
+            self.invalidations += len(stale)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+response_cache = ResponseCache()
+versions.listeners.append(response_cache.invalidate)
+
+def cached_json(handler, key, domains, build):
+    # Serve a public GET from the response cache; build(conn) makes the data on a miss
+    etag = check_etag(handler, *domains)
+    if not etag: return
+    body = response_cache.get(key, etag)
+    if body is None:
+        with db() as conn:
+            data = build(conn)
+        start = time.perf_counter()
+        body = json.dumps(data, default=str).encode()
+        clock.serialize += time.perf_counter() - start
+        response_cache.put(key, etag, domains, body)
+    send_json(handler, body, etag=etag)
+
+def is_whole_number(s):
+    # ASCII digits only: isdigit() also takes "²", which int() then rejects
+    return s.isascii() and s.isdecimal()
+
 def read_body(handler):
+    handler.body_read = True
     length = int(handler.headers.get("Content-Length", 0))
     if length == 0:
         return {}
     return json.loads(handler.rfile.read(length))
 
-def get_user(handler):
-    cookie = handler.headers.get("Cookie", "")
-    token = None
-    for c in cookie.split(";"):
+def body_lines(handler, limit=IMPORT_LINE_BYTES):
+    # The request body a line at a time, read off the socket up to
+    # Content-Length. A line longer than limit is skipped and yields None.
+    # The body only counts as read once the generator is exhausted, so a
+    # caller that stops early gets the connection closed behind it.
+    remaining = int(handler.headers.get("Content-Length", 0))
+    while remaining > 0:
+        line = handler.rfile.readline(min(remaining, limit + 1))
+        if not line:
+            break
+        remaining -= len(line)
+        if len(line.rstrip(b"\r\n")) <= limit:
+            yield line.decode("utf-8", "replace")
+            continue
+        while remaining > 0 and not line.endswith(b"\n"):
+            line = handler.rfile.readline(min(remaining, limit))
+            if not line:
+                break
+            remaining -= len(line)
+        yield None
+    handler.body_read = True
+
+def request_token(handler):
+    auth = handler.headers.get("Authorization", "")
+    if auth.startswith("Bearer "):
+        return auth[7:]
+    for c in handler.headers.get("Cookie", "").split(";"):
         c = c.strip()
         if c.startswith("token="):
-            token = c[6:]
-    if not token:
-        auth = handler.headers.get("Authorization", "")
-        if auth.startswith("Bearer "):
-            token = auth[7:]
-    return verify_token(token)
+            return c[6:]
+    return None
+
+def get_user(handler):
+    return sessions.verify(request_token(handler))
 
 
-# ── Database Setup ───────────────────────────────────────────────────────
+# ── Live Events ──────────────────────────────────────────────────────────
 
-def init_db():
-    conn = db()
-    conn.executescript("""
+class SocketStream:
+    """An /api/stream client on the threaded server: the socket is handed
+    over by its worker and written non-blocking by the hub thread."""
+
+    def __init__(self, sock):
+        sock.setblocking(False)
+        self.sock = sock
+        self.pending = bytearray()
+        self.events = selectors.EVENT_READ
+
+    def send(self, data):
+        if len(self.pending) + len(data) > SSE_CLIENT_BUFFER:
+            return False
+        self.pending += data
+        return self.flush()
+
+    def flush(self):
+        try:
+            del self.pending[:self.sock.send(self.pending)]
+        except BlockingIOError:
+            pass
+        except OSError:
+            return False
+        return True
+
+    def close(self):
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+class EventHub:
+    """Fan-out for /api/stream. An event is formatted once and queued to the
+    hub thread, which writes it to every client without blocking: a slow
+    reader only grows its own buffer until it passes SSE_CLIENT_BUFFER and
+    is dropped. Idle streams get a comment every SSE_HEARTBEAT seconds."""
+
+    def __init__(self, max_clients=SSE_MAX_CLIENTS):
+        self.max_clients = max_clients
+        self.count = 0  # reserved + attached
+        self.published = self.dropped = 0
+        self._clients = set()
+        self._inbox = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def reserve(self):
+        with self._lock:
+            if self.count >= self.max_clients:
+                return False
+            self.count += 1
+            if self._thread is None:
+                self._wake_r, self._wake_w = socket.socketpair()
+                self._wake_r.setblocking(False)
+                self._thread = threading.Thread(target=self._run, name="event-hub", daemon=True)
+                self._thread.start()
+            return True
+
+    def release(self):
+        with self._lock:
+            self.count -= 1
+
+    def attach(self, client):
+        self._post("add", client)
+
+    def detach(self, client):
+        self._post("remove", client)
+
+    def publish(self, event, data):
+        if self.count:
+            self.published += 1
+            self._post("send", f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n".encode())
+
+    def close_all(self):
+        if self._thread:
+            self._post("close", None)
+
+    def stats(self):
+        return {"clients": self.count, "max_clients": self.max_clients,
+                "published": self.published, "dropped": self.dropped}
+
+    def _post(self, op, arg):
+        self._inbox.put((op, arg))
+        try:
+            self._wake_w.send(b"\0")
+        except OSError:
+            pass  # wake-up pipe full; the hub is awake already
+
+    def _run(self):
+        sel = selectors.DefaultSelector()
+        sel.register(self._wake_r, selectors.EVENT_READ)
+        next_beat = time.monotonic() + SSE_HEARTBEAT
+        while True:
+            for key, mask in sel.select(max(0, next_beat - time.monotonic())):
+                client = key.data
+                if client is None:
+                    try:
+                        self._wake_r.recv(4096)
+                    except BlockingIOError:
+                        pass
+                    continue
+                if mask & selectors.EVENT_READ:
+                    try:
+                        gone = not client.sock.recv(4096)  # clients only ever hang up
+                    except BlockingIOError:
+                        gone = False
+                    except OSError:
+                        gone = True
+                    if gone:
+                        self._drop(sel, client)
+                        continue
+                if mask & selectors.EVENT_WRITE:
+                    if not client.flush():
+                        self._drop(sel, client)
+                    else:
+                        self._watch(sel, client)
+            while True:
+                try:
+                    op, arg = self._inbox.get_nowait()
+                except queue.Empty:
+                    break
+                if op == "add":
+                    self._clients.add(arg)
+                    if arg.sock:
+                        sel.register(arg.sock, arg.events, arg)
+                elif op == "remove":
+                    self._drop(sel, arg)
+                elif op == "send":
+                    self._broadcast(sel, arg)
+                elif op == "close":
+                    for client in list(self._clients):
+                        self._drop(sel, client)
+            if time.monotonic() >= next_beat:
+                self._broadcast(sel, b": ping\n\n")
+                next_beat = time.monotonic() + SSE_HEARTBEAT
+
+    def _broadcast(self, sel, data):
+        for client in list(self._clients):
+            if not client.send(data):
+                self.dropped += 1
+                self._drop(sel, client)
+            elif client.sock:
+                self._watch(sel, client)
+
+    def _watch(self, sel, client):
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if client.pending else 0)
+        if events != client.events:
+            client.events = events
+            sel.modify(client.sock, events, client)
+
+    def _drop(self, sel, client):
+        if client not in self._clients:
+            return
+        self._clients.discard(client)
+        if client.sock:
+            sel.unregister(client.sock)
+        client.close()
+        self.release()
+
+stream_hub = EventHub()
+
+def publish_versions(domains):
+    # Only points and ranks are pushed; "tips" (tip counts, new players) just
+    # expires cached leaderboard pages, or every submission would make each
+    # open tab refetch
+    if "leaderboard" in domains:
+        stream_hub.publish("leaderboard", {"etag": versions.etag("leaderboard", "tips")})
+
+versions.listeners.append(publish_versions)
+
+
+# ── Metrics ──────────────────────────────────────────────────────────────
+# Always on: per request it costs two perf_counter() calls per SQL call and
+# one locked dict update when the response is done.
+
+class RequestClock(threading.local):
+    # Seconds the current request on this thread has spent in SQLite and in
+    # json.dumps, and its route; reset by Handler.dispatch
+    sql = 0.0
+    serialize = 0.0
+    route = None
+
+clock = RequestClock()
+
+class TimedCursor(sqlite3.Cursor):
+    # A statement that raises is not timed; errors are rare and this stays lean
+    def execute(self, sql, params=()):
+        start = time.perf_counter()
+        super().execute(sql, params)
+        elapsed = time.perf_counter() - start
+        clock.sql += elapsed
+        if profiler.enabled:
+            profiler.begin(self, sql, params, elapsed)
+        return self
+
+    def executemany(self, sql, params):
+        start = time.perf_counter()
+        super().executemany(sql, params)
+        elapsed = time.perf_counter() - start
+        clock.sql += elapsed
+        if profiler.enabled:
+            profiler.begin(self, sql, params, elapsed, many=True)
+        return self
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        elapsed = time.perf_counter() - start
+        clock.sql += elapsed
+        if profiler.enabled:
+            profiler.add(self, elapsed)
+        return row
+
+    def fetchmany(self, *args):
+        start = time.perf_counter()
+        rows = super().fetchmany(*args)
+        elapsed = time.perf_counter() - start
+        clock.sql += elapsed
+        if profiler.enabled:
+            profiler.add(self, elapsed)
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        elapsed = time.perf_counter() - start
+        clock.sql += elapsed
+        if profiler.enabled:
+            profiler.add(self, elapsed)
+        return rows
+
+    def __iter__(self):
+        # Rows are stepped in batches so iteration is timed too
+        while rows := self.fetchmany(256):
+            yield from rows
+
+class TimedConnection(sqlite3.Connection):
+    # Connection.execute() would build a plain cursor without calling cursor()
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, *args):
+        return super().cursor(TimedCursor).execute(*args)
+
+    def executemany(self, *args):
+        return super().cursor(TimedCursor).executemany(*args)
+
+SQL_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+SQL_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+SQL_TABLE_REF = re.compile(r"\b(?:FROM|JOIN|UPDATE|INTO)\s+(\w+)(?:\s+(?:AS\s+)?(?!ON\b|USING\b|WHERE\b|SET\b|JOIN\b|LEFT\b|INNER\b|CROSS\b|GROUP\b|ORDER\b|LIMIT\b|VALUES\b)(\w+))?", re.I)
+
+def normalize_sql(sql):
+    # One line, literals as ?, and IN lists of any length folded together
+    sql = SQL_LITERAL.sub("?", " ".join(sql.split()))
+    return SQL_IN_LIST.sub("(?, ...)", sql)
+
+def params_shape(params, many=False):
+    # Types only; values (emails, hashes) never leave the statement
+    if many:
+        if not isinstance(params, (list, tuple)):
+            return "iterator"
+        return f"{len(params)} x {params_shape(params[0])}" if params else "0 rows"
+    if isinstance(params, dict):
+        return "{" + ", ".join(f"{k}: {type(v).__name__}" for k, v in params.items()) + "}"
+    names = [type(p).__name__ for p in params]
+    if len(names) > 8 and len(set(names)) == 1:
+        return f"({names[0]} x {len(names)})"
+    return "(" + ", ".join(names) + ")"
+
+class QueryProfiler:
+    """Opt-in SQL profiler (SQL_PROFILE=1, or switched on from the admin
+    endpoint). Each statement is timed from execute() through its last
+    fetch and totalled by normalized text. A statement that passes
+    threshold_ms is also logged and kept in a ring buffer with its
+    parameter shape and EXPLAIN QUERY PLAN, with full table scans flagged.
+    Memory is bounded: SQL_SLOW_KEEP entries, 500 statement totals and a
+    small plan cache."""
+
+    MAX_STATEMENTS = 500
+    MAX_PLANS = 256
+
+    def __init__(self, enabled=SQL_PROFILE, threshold_ms=SQL_SLOW_MS, keep=SQL_SLOW_KEEP):
+        self.enabled = enabled
+        self.threshold_ms = threshold_ms
+        self.slow = deque(maxlen=keep)
+        self.statements = {}  # normalized sql -> [count, seconds, max seconds]
+        self._normalized = {}
+        self._plans = OrderedDict()
+        self._lock = threading.Lock()
+
+    def begin(self, cursor, sql, params, elapsed, many=False):
+        key = self._normalized.get(sql)
+        if key is None:
+            key = normalize_sql(sql)
+            if len(self._normalized) < 4 * self.MAX_STATEMENTS:
+                self._normalized[sql] = key
+        cursor.profile = [key, sql, params, many, 0.0, None]
+        with self._lock:
+            stats = self.statements.get(key)
+            if stats is None and len(self.statements) < self.MAX_STATEMENTS:
+                stats = self.statements[key] = [0, 0.0, 0.0]
+            if stats:
+                stats[0] += 1
+        self.add(cursor, elapsed)
+
+    def add(self, cursor, elapsed):
+        p = getattr(cursor, "profile", None)
+        if p is None:
+            return
+        p[4] += elapsed
+        with self._lock:
+            stats = self.statements.get(p[0])
+            if stats:
+                stats[1] += elapsed
+                stats[2] = max(stats[2], p[4])
+        if p[4] * 1000 < self.threshold_ms:
+            return
+        if p[5]:
+            p[5]["ms"] = round(p[4] * 1000, 3)  # still fetching; keep the entry current
+            return
+        key, sql, params, many, total, _ = p
+        plan = self._plan(cursor.connection, key, sql, params, many)
+        aliases = {}
+        for table, alias in SQL_TABLE_REF.findall(sql):
+            aliases[table.lower()] = table
+            if alias:
+                aliases[alias.lower()] = table
+        # A bare "SCAN <table>" reads every row; "SCAN t USING [COVERING] INDEX"
+        # walks an index in order and materialized subqueries aren't tables
+        scans = sorted({aliases[w[1].lower()] for w in (d.split() for d in plan or ())
+                        if len(w) == 2 and w[0] == "SCAN" and w[1].lower() in aliases})
+        p[5] = entry = {
+            "at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "ms": round(total * 1000, 3),
+            "route": clock.route,
+            "sql": key,
+            "params": params_shape(params, many),
+            "plan": plan,
+            "full_scans": scans,
+        }
+        with self._lock:
+            self.slow.append(entry)
+        print(f"  SLOW SQL >{self.threshold_ms:g}ms [{entry['route'] or '-'}] {key[:160]}"
+              + (f"  (full scan: {', '.join(scans)})" if scans else ""))
+
+    def _plan(self, conn, key, sql, params, many):
+        with self._lock:
+            if key in self._plans:
+                return self._plans[key]
+        if many:
+            params = params[0] if isinstance(params, (list, tuple)) and params else None
+        plan = None
+        if params is not None:
+            try:
+                # Plain Connection.execute so explaining is not itself profiled
+                plan = [r[3] for r in sqlite3.Connection.execute(conn, "EXPLAIN QUERY PLAN " + sql, params)] or None
+            except sqlite3.Error:
+                pass
+        with self._lock:
+            self._plans[key] = plan
+            if len(self._plans) > self.MAX_PLANS:
+                self._plans.popitem(last=False)
+        return plan
+
+    def configure(self, enabled=None, threshold_ms=None):
+        if threshold_ms is not None:
+            self.threshold_ms = float(threshold_ms)
+        if enabled is not None:
+            self.enabled = bool(enabled)
+
+    def clear(self):
+        with self._lock:
+            self.slow.clear()
+            self.statements.clear()
+            self._plans.clear()
+
+    def report(self, top=25):
+        with self._lock:
+            slow = list(self.slow)[::-1]
+            stats = sorted(self.statements.items(), key=lambda kv: kv[1][1], reverse=True)[:top]
+        return {
+            "enabled": self.enabled,
+            "threshold_ms": self.threshold_ms,
+            "keep": self.slow.maxlen,
+            "slow": slow,
+            "statements": [{"sql": k, "count": n, "total_ms": round(t * 1000, 3), "max_ms": round(mx * 1000, 3),
+                            "mean_ms": round(t / n * 1000, 3) if n else None} for k, (n, t, mx) in stats],
+        }
+
+profiler = QueryProfiler()
+
+class Metrics:
+    """Request counters per route since boot: status codes, a latency
+    histogram, response bytes, and the share of time spent in SQLite and in
+    JSON serialization. Routes are named after their handler function."""
+
+    def __init__(self, buckets=METRIC_BUCKETS):
+        self.buckets = buckets
+        self.started = time.time()
+        self.routes = {}
+        self._lock = threading.Lock()
+
+    def record(self, route, status, seconds, nbytes, sql, serialize):
+        with self._lock:
+            m = self.routes.get(route)
+            if m is None:
+                m = self.routes[route] = {"count": 0, "status": {}, "histogram": [0] * (len(self.buckets) + 1),
+                                          "seconds": 0.0, "bytes": 0, "sql_seconds": 0.0, "serialize_seconds": 0.0}
+            m["count"] += 1
+            m["status"][status] = m["status"].get(status, 0) + 1
+            m["histogram"][bisect.bisect_left(self.buckets, seconds)] += 1
+            m["seconds"] += seconds
+            m["bytes"] += nbytes
+            m["sql_seconds"] += sql
+            m["serialize_seconds"] += serialize
+
+    def _copy(self):
+        with self._lock:
+            return {r: {**m, "status": dict(m["status"]), "histogram": list(m["histogram"])}
+                    for r, m in sorted(self.routes.items())}
+
+    def _quantile(self, histogram, count, q):
+        # Upper bound of the bucket holding the q-th request, as Prometheus would estimate
+        seen = 0
+        for bound, n in zip(self.buckets, histogram):
+            seen += n
+            if seen >= q * count:
+                return bound * 1000
+        return None  # beyond the last bucket
+
+    def snapshot(self):
+        routes = {}
+        for r, m in self._copy().items():
+            n = m["count"]
+            routes[r] = {
+                "requests": n,
+                "status": {str(k): v for k, v in sorted(m["status"].items())},
+                "bytes": m["bytes"],
+                "mean_ms": round(m["seconds"] / n * 1000, 3),
+                "p50_ms": self._quantile(m["histogram"], n, 0.5),
+                "p95_ms": self._quantile(m["histogram"], n, 0.95),
+                "p99_ms": self._quantile(m["histogram"], n, 0.99),
+                "sql_ms": round(m["sql_seconds"] * 1000, 3),
+                "serialize_ms": round(m["serialize_seconds"] * 1000, 3),
+                "total_ms": round(m["seconds"] * 1000, 3),
+                "histogram": dict(zip([str(b) for b in self.buckets] + ["+Inf"], m["histogram"])),
+            }
+        return {"uptime_s": round(time.time() - self.started, 1), "buckets": list(self.buckets), "routes": routes}
+
+    def prometheus(self):
+        routes = self._copy()
+        out = []
+        def family(name, kind, help):
+            out.append(f"# HELP {name} {help}")
+            out.append(f"# TYPE {name} {kind}")
+        family("cmk_http_requests_total", "counter", "Requests handled, by route and status.")
+        for r, m in routes.items():
+            for status, n in sorted(m["status"].items()):
+                out.append(f'cmk_http_requests_total{{route="{r}",status="{status}"}} {n}')
+        family("cmk_http_request_duration_seconds", "histogram", "Time from dispatch to response written.")
+        for r, m in routes.items():
+            cumulative = 0
+            for bound, n in zip([str(b) for b in self.buckets] + ["+Inf"], m["histogram"]):
+                cumulative += n
+                out.append(f'cmk_http_request_duration_seconds_bucket{{route="{r}",le="{bound}"}} {cumulative}')
+            out.append(f'cmk_http_request_duration_seconds_sum{{route="{r}"}} {m["seconds"]:.6f}')
+            out.append(f'cmk_http_request_duration_seconds_count{{route="{r}"}} {m["count"]}')
+        for name, key, help in (
+            ("cmk_http_response_bytes_total", "bytes", "Response body bytes (Content-Length)."),
+            ("cmk_http_sqlite_seconds_total", "sql_seconds", "Time spent executing and fetching SQL."),
+            ("cmk_http_serialize_seconds_total", "serialize_seconds", "Time spent encoding JSON responses."),
+        ):
+            family(name, "counter", help)
+            for r, m in routes.items():
+                value = m[key] if key == "bytes" else f"{m[key]:.6f}"
+                out.append(f'{name}{{route="{r}"}} {value}')
+        family("cmk_process_start_time_seconds", "gauge", "Unix time the server started.")
+        out.append(f"cmk_process_start_time_seconds {self.started:.0f}")
+        return "\n".join(out) + "\n"
+
+metrics = Metrics()
+
+
+# ── Backups ──────────────────────────────────────────────────────────────
+
+class BackupManager:
+    """Online copies of the database through SQLite's backup API, one at a
+    time on a background thread. Pages are copied BACKUP_STEP_PAGES at a time
+    with a short sleep between steps, inside one read transaction on the
+    backup's own connection: under WAL that pins a snapshot, so writers carry
+    on and the copy is never restarted by their commits. The copy goes to a
+    .partial file, is quick_checked, then renamed into place; only the
+    newest BACKUP_KEEP are kept."""
+
+    def __init__(self, db_path=DB_PATH, directory=BACKUP_DIR, keep=BACKUP_KEEP):
+        self.db_path, self.directory, self.keep = db_path, directory, keep
+        self.prefix = os.path.splitext(os.path.basename(db_path))[0] + "-"
+        self.running = None  # progress of the backup in flight
+        self.last = None     # outcome of the last one to finish
+        self.interval = 0
+        self.next_due = None
+        self.failures = 0    # failed in a row, for the scheduler's back-off
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()  # set when a backup finishes or on stop
+
+    def start(self, reason="manual"):
+        # The backup's thread, or None if one is already running
+        with self._lock:
+            if self.running:
+                return None
+            self.running = {"reason": reason, "phase": "copying", "started_at": time.time(),
+                            "pages_total": 0, "pages_done": 0}
+        t = threading.Thread(target=self._run, args=(self.running,), name="backup", daemon=True)
+        t.start()
+        return t
+
+    def _run(self, progress):
+        name = f"{self.prefix}{datetime.now(timezone.utc):%Y%m%d-%H%M%S}.db"
+        final = os.path.join(self.directory, name)
+        partial = final + ".partial"
+        result = {"reason": progress["reason"], "started_at": progress["started_at"]}
+
+        def step(status, remaining, total):
+            progress["pages_total"], progress["pages_done"] = total, total - remaining
+            time.sleep(BACKUP_STEP_PAUSE)
+
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            for f in os.listdir(self.directory):
+                if f.startswith(self.prefix) and f.endswith(".partial"):
+                    os.remove(os.path.join(self.directory, f))  # left by a crash mid-copy
+            src = sqlite3.connect(self.db_path, isolation_level=None)
+            dst = sqlite3.connect(partial)
+            try:
+                src.execute("BEGIN")
+                src.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+                src.backup(dst, pages=BACKUP_STEP_PAGES, progress=step)
+                src.execute("COMMIT")
+                dst.execute("PRAGMA journal_mode=DELETE")  # one self-contained file
+                progress["phase"] = "checking"
+                check = dst.execute("PRAGMA quick_check").fetchone()[0]
+                if check != "ok":
+                    raise sqlite3.DatabaseError(f"quick_check: {check}")
+            finally:
+                dst.close()
+                src.close()
+            os.replace(partial, final)
+            result.update(ok=True, file=name, bytes=os.path.getsize(final), pages=progress["pages_total"])
+            self.prune()
+        except (OSError, sqlite3.Error) as e:
+            result.update(ok=False, error=str(e))
+            try:
+                os.remove(partial)
+            except OSError:
+                pass
+            print(f"  Backup failed: {e}")
+        finally:
+            result["seconds"] = round(time.time() - progress["started_at"], 2)
+            with self._lock:
+                self.failures = 0 if result["ok"] else self.failures + 1
+                self.last, self.running = result, None
+            self._wake.set()
+
+    def backups(self):
+        # Finished backups on disk, newest first
+        try:
+            names = sorted((f for f in os.listdir(self.directory)
+                            if f.startswith(self.prefix) and f.endswith(".db")), reverse=True)
+        except OSError:
+            return []  # not created yet, or not a usable directory
+        out = []
+        for f in names:
+            try:
+                st = os.stat(os.path.join(self.directory, f))
+            except OSError:
+                continue  # pruned meanwhile
+            out.append({"file": f, "bytes": st.st_size, "created_at": st.st_mtime})
+        return out
+
+    def prune(self):
+        for b in self.backups()[self.keep:]:
+            os.remove(os.path.join(self.directory, b["file"]))
+
+    def schedule(self, interval):
+        # Back up every interval seconds, counted from the last attempt. Before
+        # the first one that is the newest backup on disk (or now if there is
+        # none), so restarts don't reset the clock. After a failure the retry
+        # waits BACKUP_RETRY, doubling each time, up to the interval.
+        self.interval = interval
+        newest = self.backups()[:1]
+        since = newest[0]["created_at"] if newest else time.time()
+
+        def loop():
+            while not self._stop.is_set():
+                self._wake.clear()
+                with self._lock:
+                    last, failures = self.last, self.failures
+                wait = min(interval, BACKUP_RETRY * 2 ** (failures - 1)) if failures else interval
+                self.next_due = (last["started_at"] if last else since) + wait
+                if self.next_due > time.time():
+                    self._wake.wait(self.next_due - time.time())
+                elif not self.start("scheduled"):
+                    self._wake.wait()  # a manual backup is running; count from it
+
+        threading.Thread(target=loop, name="backup-scheduler", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def status(self):
+        with self._lock:
+            running = dict(self.running) if self.running else None
+            last = self.last
+        if running:
+            running["percent"] = round(100 * running["pages_done"] / running["pages_total"], 1) \
+                if running["pages_total"] else 0.0
+        return {"running": running, "last": last, "directory": self.directory, "keep": self.keep,
+                "interval": self.interval, "next_due": self.next_due, "backups": self.backups()}
+
+    def stats(self):
+        status = self.status()
+        return {"running": status["running"] is not None, "last": status["last"], "kept": len(status["backups"])}
+
+backups = BackupManager()
+
+
+# ── Database Setup ───────────────────────────────────────────────────────
+# The schema is versioned with PRAGMA user_version. Each migration below
+# moves it up one version inside its own transaction; a database that is
+# already current skips all DDL and seeding on boot.
+
+def run_script(conn, sql):
+    # executescript() would commit the migration's transaction, so split instead
+    for stmt in sql.split(";"):
+        if stmt.strip():
+            conn.execute(stmt)
+
+def migrate_base_schema(conn):
+    """base tables and seed data"""
+    run_script(conn, """
         CREATE TABLE IF NOT EXISTS users (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             email TEXT UNIQUE NOT NULL,
@@ -140,12 +1163,10 @@ def init_db():
         );
     """)
 
-    # Migration: add fav_team_id if missing
-    try:
-        conn.execute("SELECT fav_team_id FROM users LIMIT 1")
-    except sqlite3.OperationalError:
+    # Databases created before fav_team_id existed
+    cols = [r["name"] for r in conn.execute("PRAGMA table_info(users)")]
+    if "fav_team_id" not in cols:
         conn.execute("ALTER TABLE users ADD COLUMN fav_team_id INTEGER REFERENCES teams(id)")
-        conn.commit()
         print("  Migrated: added fav_team_id column")
 
     # Seed admin if none exists
@@ -155,7 +1176,6 @@ def init_db():
             "INSERT INTO users (email, display_name, password_hash, is_admin) VALUES (?,?,?,1)",
             ("admin@cmkrugby.co.nz", "Admin", hash_password("admin123"))
         )
-        conn.commit()
         print("  Default admin: admin@cmkrugby.co.nz / admin123")
 
     # Seed teams if empty
@@ -177,14 +1197,331 @@ def init_db():
             "INSERT INTO teams (name, short_name, color) VALUES (?,?,?)",
             taranaki_teams
         )
-        conn.commit()
         print(f"  Seeded {len(taranaki_teams)} Taranaki teams")
 
-    conn.close()
+def migrate_user_totals(conn):
+    """leaderboard totals"""
+    run_script(conn, """
+        CREATE TABLE IF NOT EXISTS user_totals (
+            user_id INTEGER PRIMARY KEY REFERENCES users(id),
+            total_points INTEGER NOT NULL DEFAULT 0,
+            total_tips INTEGER NOT NULL DEFAULT 0,
+            correct_tips INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_user_totals_rank
+            ON user_totals(total_points DESC, correct_tips DESC);
+    """)
+    rebuild_totals(conn)
+
+def migrate_hot_path_indexes(conn):
+    """indexes for per-fixture, per-round, per-member and non-admin lookups"""
+    run_script(conn, """
+        CREATE INDEX IF NOT EXISTS idx_tips_fixture ON tips(fixture_id, user_id, points_earned);
+        CREATE INDEX IF NOT EXISTS idx_fixtures_round ON fixtures(round_id, kickoff);
+        CREATE INDEX IF NOT EXISTS idx_group_members_user ON group_members(user_id, group_id);
+        CREATE INDEX IF NOT EXISTS idx_users_admin ON users(is_admin, display_name)
+    """)
+
+def migrate_sessions(conn):
+    """persistent sessions and signing key"""
+    run_script(conn, """
+        CREATE TABLE IF NOT EXISTS settings (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS sessions (
+            id TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            is_admin INTEGER NOT NULL DEFAULT 0,
+            created_at REAL NOT NULL,
+            expires_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_sessions_user ON sessions(user_id);
+        CREATE INDEX IF NOT EXISTS idx_sessions_expiry ON sessions(expires_at)
+    """)
+    conn.execute("INSERT OR IGNORE INTO settings (key, value) VALUES ('session_key', ?)",
+                 (secrets.token_hex(32),))
+
+def migrate_group_member_count(conn):
+    """stored group member counts"""
+    conn.execute("ALTER TABLE groups_ ADD COLUMN member_count INTEGER NOT NULL DEFAULT 0")
+    recount_group_members(conn)
+
+def migrate_round_history(conn):
+    """per-round scores and standings snapshots"""
+    run_script(conn, """
+        CREATE TABLE IF NOT EXISTS round_scores (
+            round_id INTEGER NOT NULL REFERENCES rounds(id) ON DELETE CASCADE,
+            user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            points INTEGER NOT NULL DEFAULT 0,
+            correct_tips INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (round_id, user_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_round_scores_user ON round_scores(user_id, round_id);
+        CREATE TABLE IF NOT EXISTS standings (
+            round_id INTEGER NOT NULL REFERENCES rounds(id) ON DELETE CASCADE,
+            user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            rank INTEGER NOT NULL,
+            rank_change INTEGER,
+            total_points INTEGER NOT NULL,
+            correct_tips INTEGER NOT NULL,
+            round_points INTEGER NOT NULL,
+            PRIMARY KEY (round_id, user_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_standings_rank
+            ON standings(round_id, total_points DESC, correct_tips DESC)
+    """)
+    rebuild_round_scores(conn)
+    rebuild_standings(conn)
+
+MIGRATIONS = [
+    migrate_base_schema,
+    migrate_user_totals,
+    migrate_hot_path_indexes,
+    migrate_sessions,
+    migrate_group_member_count,
+    migrate_round_history,
+]
+
+def init_db():
+    with db() as conn:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for n, migrate in enumerate(MIGRATIONS[version:], version + 1):
+            conn.execute("BEGIN")
+            migrate(conn)
+            conn.execute(f"PRAGMA user_version={n}")
+            conn.commit()
+            print(f"  Schema v{n}: {migrate.__doc__}")
+        sessions.load_key(conn)
+
+
+# ── Scoring & Totals ─────────────────────────────────────────────────────
+# user_totals holds each user's running score so the leaderboard is an
+# index read. It is kept in step inside the same transaction as the write
+# that changes tips: scoring a fixture, submitting tips, deleting a user.
+# round_scores is the same per round. standings freezes the table when a
+# round is completed: cumulative totals, dense rank and the movement since
+# the previous snapshot.
+
+# Margin categories: 0 = draw, 1-12 = 1-12, 13+ = 13+
+# Frontend sends: draw=0, 1-12=7, 13+=20
+# Correct draw = 5; correct winner = 2, +3 if the margin category matches.
+SCORE_TIPS_SQL = """
+    UPDATE tips SET points_earned = CASE
+        WHEN f.home_score = f.away_score THEN
+            CASE WHEN tips.predicted_margin = 0 THEN 5 ELSE 0 END
+        WHEN tips.predicted_winner_id =
+             CASE WHEN f.home_score > f.away_score THEN f.home_team_id ELSE f.away_team_id END THEN
+            2 + CASE WHEN (CASE WHEN tips.predicted_margin = 0 THEN 'draw'
+                                WHEN tips.predicted_margin <= 12 THEN '1-12' ELSE '13+' END)
+                        = (CASE WHEN abs(f.home_score - f.away_score) <= 12 THEN '1-12' ELSE '13+' END)
+                     THEN 3 ELSE 0 END
+        ELSE 0 END
+    FROM fixtures f
+    WHERE f.id = tips.fixture_id AND f.id IN ({marks})
+"""
+
+def score_fixtures(conn, fixture_ids):
+    # Re-score every tip on the given completed fixtures, moving the change into user_totals
+    fixture_ids = list(set(fixture_ids))
+    apply_fixture_totals(conn, fixture_ids, -1)
+    apply_round_scores(conn, fixture_ids, -1)
+    conn.execute(SCORE_TIPS_SQL.format(marks=",".join("?" * len(fixture_ids))), fixture_ids)
+    apply_fixture_totals(conn, fixture_ids, 1)
+    apply_round_scores(conn, fixture_ids, 1)
+    # A result on an already completed round corrects its snapshot, and the
+    # later ones, whose totals include it
+    first = conn.execute(f"""
+        SELECT MIN(r.round_number) FROM rounds r JOIN fixtures f ON f.round_id=r.id
+        WHERE f.id IN ({",".join("?" * len(fixture_ids))}) AND r.status='completed'
+    """, fixture_ids).fetchone()[0]
+    if first is not None:
+        rebuild_standings(conn, first)
+
+def rebuild_totals(conn):
+    conn.execute("DELETE FROM user_totals")
+    cur = conn.execute("""
+        INSERT INTO user_totals (user_id, total_points, total_tips, correct_tips)
+        SELECT u.id, COALESCE(SUM(t.points_earned), 0), COUNT(t.id),
+               COALESCE(SUM(t.points_earned > 0), 0)
+        FROM users u
+        LEFT JOIN tips t ON t.user_id=u.id
+        GROUP BY u.id
+    """)
+    return cur.rowcount
+
+def apply_fixture_totals(conn, fixture_ids, sign):
+    # Add (sign=1) or take back (sign=-1) the points currently on the fixtures' tips
+    conn.execute(f"""
+        UPDATE user_totals SET
+            total_points = total_points + ? * d.points,
+            correct_tips = correct_tips + ? * d.correct
+        FROM (SELECT user_id, SUM(points_earned) points, SUM(points_earned > 0) correct
+              FROM tips WHERE fixture_id IN ({",".join("?" * len(fixture_ids))})
+              GROUP BY user_id) d
+        WHERE d.user_id = user_totals.user_id
+    """, (sign, sign, *fixture_ids))
+
+def apply_round_scores(conn, fixture_ids, sign):
+    # The same change, split by round, into round_scores
+    conn.execute(f"""
+        INSERT INTO round_scores (round_id, user_id, points, correct_tips)
+        SELECT f.round_id, t.user_id, ? * SUM(t.points_earned), ? * SUM(t.points_earned > 0)
+        FROM tips t JOIN fixtures f ON f.id=t.fixture_id
+        WHERE t.fixture_id IN ({",".join("?" * len(fixture_ids))})
+        GROUP BY f.round_id, t.user_id
+        ON CONFLICT (round_id, user_id) DO UPDATE SET
+            points = points + excluded.points,
+            correct_tips = correct_tips + excluded.correct_tips
+    """, (sign, sign, *fixture_ids))
+
+def rebuild_round_scores(conn):
+    conn.execute("DELETE FROM round_scores")
+    return conn.execute("""
+        INSERT INTO round_scores (round_id, user_id, points, correct_tips)
+        SELECT f.round_id, t.user_id, SUM(t.points_earned), SUM(t.points_earned > 0)
+        FROM tips t JOIN fixtures f ON f.id=t.fixture_id
+        WHERE f.status='completed'
+        GROUP BY f.round_id, t.user_id
+    """).rowcount
+
+def snapshot_standings(conn, round_id):
+    # (Re)take a round's snapshot: the previous snapshot's totals plus this
+    # round's round_scores, dense-ranked, with the rank change against it
+    number = conn.execute("SELECT round_number FROM rounds WHERE id=?", (round_id,)).fetchone()[0]
+    prev = conn.execute("""
+        SELECT id FROM rounds r
+        WHERE round_number < ? AND EXISTS (SELECT 1 FROM standings WHERE round_id=r.id)
+        ORDER BY round_number DESC, id DESC LIMIT 1
+    """, (number,)).fetchone()
+    conn.execute("DELETE FROM standings WHERE round_id=?", (round_id,))
+    return conn.execute("""
+        INSERT INTO standings (round_id, user_id, rank, rank_change, total_points, correct_tips, round_points)
+        SELECT ?, user_id, rank, prev_rank - rank, total_points, correct_tips, round_points
+        FROM (
+            SELECT user_id, prev_rank, total_points, correct_tips, round_points,
+                   DENSE_RANK() OVER (ORDER BY total_points DESC, correct_tips DESC) rank
+            FROM (
+                SELECT u.id user_id, p.rank prev_rank,
+                       COALESCE(p.total_points, 0) + COALESCE(rs.points, 0) total_points,
+                       COALESCE(p.correct_tips, 0) + COALESCE(rs.correct_tips, 0) correct_tips,
+                       COALESCE(rs.points, 0) round_points
+                FROM users u
+                LEFT JOIN standings p ON p.round_id=? AND p.user_id=u.id
+                LEFT JOIN round_scores rs ON rs.round_id=? AND rs.user_id=u.id
+                WHERE u.is_admin=0
+            )
+        )
+    """, (round_id, prev and prev[0], round_id)).rowcount
+
+def rebuild_standings(conn, from_round_number=None):
+    # Retake the snapshots of completed rounds in order, from the given round on
+    rounds = conn.execute("""
+        SELECT id FROM rounds WHERE status='completed' AND round_number >= ? ORDER BY round_number, id
+    """, (from_round_number or 0,)).fetchall()
+    if from_round_number is None:
+        conn.execute("DELETE FROM standings")
+    for (round_id,) in rounds:
+        snapshot_standings(conn, round_id)
+    return len(rounds)
+
+def recount_group_members(conn):
+    # groups_.member_count is kept in step by create/join/delete-user; this rebuilds it
+    return conn.execute("""
+        UPDATE groups_ SET member_count =
+            (SELECT COUNT(*) FROM group_members gm WHERE gm.group_id=groups_.id)
+    """).rowcount
+
+def refresh_tip_count(conn, user_id):
+    conn.execute(
+        "UPDATE user_totals SET total_tips=(SELECT COUNT(*) FROM tips WHERE user_id=?) WHERE user_id=?",
+        (user_id, user_id)
+    )
+
+
+# ── Routing ──────────────────────────────────────────────────────────────
+
+class Router:
+    """Route table built once at import time by the @route decorator. Fully
+    literal paths are a single dict lookup; the rest are stored as a trie of
+    segments, so a lookup is one dict step per path segment however many
+    routes there are. <int:name> and <str:name> segments capture typed
+    parameters, passed to the handler as keywords."""
+
+    CONVERTERS = {"int": int, "str": str}
+
+    def __init__(self):
+        self.root = self._node()
+        self.literal = {}  # "/api/teams" -> methods dict of that trie node
+
+    @staticmethod
+    def _node():
+        return {"static": {}, "params": [], "methods": {}}
+
+    def add(self, method, pattern, fn):
+        node = self.root
+        for seg in pattern.strip("/").split("/"):
+            m = re.fullmatch(r"<(\w+):(\w+)>", seg)
+            if not m:
+                node = node["static"].setdefault(seg, self._node())
+                continue
+            kind, name = m.groups()
+            for k, n, child in node["params"]:
+                if (k, n) == (kind, name):
+                    node = child
+                    break
+            else:
+                child = self._node()
+                node["params"].append((kind, name, child))
+                node["params"].sort(key=lambda p: p[0] != "int")  # typed before catch-all
+                node = child
+        if method in node["methods"]:
+            raise ValueError(f"duplicate route {method} {pattern}")
+        node["methods"][method] = fn
+        if "<" not in pattern:
+            self.literal["/" + pattern.strip("/")] = node["methods"]
+
+    def route(self, method, pattern):
+        def register(fn):
+            self.add(method, pattern, fn)
+            return fn
+        return register
+
+    def match(self, path):
+        # Returns (methods, params) for the node at path, or (None, None)
+        methods = self.literal.get(path)
+        if methods:
+            return methods, {}
+        params = {}
+        methods = self._walk(self.root, path.strip("/").split("/"), 0, params)
+        return (methods, params) if methods else (None, None)
+
+    def _walk(self, node, segs, i, params):
+        if i == len(segs):
+            return node["methods"]
+        seg = segs[i]
+        child = node["static"].get(seg)
+        if child:
+            methods = self._walk(child, segs, i + 1, params)
+            if methods:
+                return methods
+        for kind, name, child in node["params"]:
+            if kind == "int" and not is_whole_number(seg):
+                continue
+            params[name] = self.CONVERTERS[kind](seg)
+            methods = self._walk(child, segs, i + 1, params)
+            if methods:
+                return methods
+            del params[name]
+        return None
+
+routes = Router()
+route = routes.route
 
 
 # ── API Routes ───────────────────────────────────────────────────────────
 
+@route("POST", "/api/register")
 def api_register(handler):
     data = read_body(handler)
     email = (data.get("email") or "").strip().lower()
@@ -193,69 +1530,90 @@ def api_register(handler):
     fav_team_id = data.get("fav_team_id")
     if not email or not name or len(pw) < 6:
         return json_response(handler, {"error": "Email, name, and password (6+ chars) required"}, 400)
-    conn = db()
     try:
-        conn.execute(
-            "INSERT INTO users (email, display_name, password_hash, fav_team_id) VALUES (?,?,?,?)",
-            (email, name, hash_password(pw), fav_team_id)
-        )
-        conn.commit()
+        password_hash = run_auth(hash_password, pw)
+    except AuthBusy:
+        return json_response(handler, {"error": "Too many sign-ins right now, try again in a moment"}, 503)
+    with db() as conn:
+        try:
+            cur = conn.execute(
+                "INSERT INTO users (email, display_name, password_hash, fav_team_id) VALUES (?,?,?,?)",
+                (email, name, password_hash, fav_team_id)
+            )
+            conn.execute("INSERT INTO user_totals (user_id) VALUES (?)", (cur.lastrowid,))
+            conn.commit()
+            versions.bump("tips")
+        except sqlite3.IntegrityError:
+            return json_response(handler, {"error": "Email already registered"}, 409)
         user = conn.execute("SELECT id, is_admin FROM users WHERE email=?", (email,)).fetchone()
-        token = make_token(user["id"], bool(user["is_admin"]))
-        return json_response(handler, {"token": token, "user": {"id": user["id"], "display_name": name, "email": email, "is_admin": bool(user["is_admin"])}})
-    except sqlite3.IntegrityError:
-        return json_response(handler, {"error": "Email already registered"}, 409)
-    finally:
-        conn.close()
+        token = sessions.create(conn, user["id"], user["is_admin"])
+    return json_response(handler, {"token": token, "user": {"id": user["id"], "display_name": name, "email": email, "is_admin": bool(user["is_admin"])}})
 
+@route("POST", "/api/login")
 def api_login(handler):
     data = read_body(handler)
     email = (data.get("email") or "").strip().lower()
     pw = data.get("password", "")
-    conn = db()
-    user = conn.execute("SELECT * FROM users WHERE email=?", (email,)).fetchone()
-    conn.close()
-    if not user or not check_password(pw, user["password_hash"]):
+    with db() as conn:
+        user = conn.execute("SELECT * FROM users WHERE email=?", (email,)).fetchone()
+    try:
+        ok = user is not None and run_auth(check_password, pw, user["password_hash"])
+    except AuthBusy:
+        return json_response(handler, {"error": "Too many sign-ins right now, try again in a moment"}, 503)
+    if not ok:
         return json_response(handler, {"error": "Invalid email or password"}, 401)
-    token = make_token(user["id"], bool(user["is_admin"]))
+    with db() as conn:
+        token = sessions.create(conn, user["id"], user["is_admin"])
     return json_response(handler, {"token": token, "user": {"id": user["id"], "display_name": user["display_name"], "email": user["email"], "is_admin": bool(user["is_admin"])}})
 
+@route("POST", "/api/logout")
+def api_logout(handler):
+    token = request_token(handler)
+    if token and sessions.verify(token):
+        with db() as conn:
+            sessions.revoke(conn, token=token)
+    return json_response(handler, {"success": True})
+
+@route("GET", "/api/me")
 def api_me(handler):
     u = get_user(handler)
     if not u:
         return json_response(handler, {"error": "Not authenticated"}, 401)
-    conn = db()
-    user = conn.execute("SELECT id, email, display_name, is_admin FROM users WHERE id=?", (u["user_id"],)).fetchone()
-    conn.close()
+    with db() as conn:
+        user = conn.execute("SELECT id, email, display_name, is_admin FROM users WHERE id=?", (u["user_id"],)).fetchone()
     if not user:
         return json_response(handler, {"error": "User not found"}, 404)
     return json_response(handler, {"user": dict(user)})
 
+@route("GET", "/api/teams")
 def api_teams(handler):
-    conn = db()
-    teams = [dict(r) for r in conn.execute("SELECT * FROM teams ORDER BY name").fetchall()]
-    conn.close()
-    return json_response(handler, teams)
+    return cached_json(handler, ("teams",), ("teams",), lambda conn: [
+        dict(r) for r in conn.execute("SELECT * FROM teams ORDER BY name").fetchall()
+    ])
 
+@route("GET", "/api/rounds")
 def api_rounds(handler):
-    conn = db()
-    rounds = [dict(r) for r in conn.execute("SELECT * FROM rounds ORDER BY round_number").fetchall()]
-    conn.close()
-    return json_response(handler, rounds)
+    return cached_json(handler, ("rounds",), ("rounds",), lambda conn: [
+        dict(r) for r in conn.execute("SELECT * FROM rounds ORDER BY round_number").fetchall()
+    ])
 
+@route("GET", "/api/fixtures")
+@route("GET", "/api/fixtures/round/<int:round_id>")
 def api_fixtures(handler, round_id=None):
-    conn = db()
     if round_id:
-        rows = conn.execute("""
-            SELECT f.*, ht.name home_team, ht.short_name home_short, ht.color home_color,
-                   at.name away_team, at.short_name away_short, at.color away_color
-            FROM fixtures f
-            JOIN teams ht ON ht.id=f.home_team_id
-            JOIN teams at ON at.id=f.away_team_id
-            WHERE f.round_id=? ORDER BY f.kickoff
-        """, (round_id,)).fetchall()
-    else:
-        rows = conn.execute("""
+        return cached_json(handler, ("fixtures", round_id), ("fixtures", "teams"), lambda conn: [
+            dict(r) for r in conn.execute("""
+                SELECT f.*, ht.name home_team, ht.short_name home_short, ht.color home_color,
+                       at.name away_team, at.short_name away_short, at.color away_color
+                FROM fixtures f
+                JOIN teams ht ON ht.id=f.home_team_id
+                JOIN teams at ON at.id=f.away_team_id
+                WHERE f.round_id=? ORDER BY f.kickoff
+            """, (round_id,)).fetchall()
+        ])
+    # The full listing also carries each fixture's round details
+    return cached_json(handler, ("fixtures",), ("fixtures", "teams", "rounds"), lambda conn: [
+        dict(r) for r in conn.execute("""
             SELECT f.*, ht.name home_team, ht.short_name home_short, ht.color home_color,
                    at.name away_team, at.short_name away_short, at.color away_color,
                    r.round_number, r.name round_name, r.deadline, r.status round_status
@@ -265,9 +1623,22 @@ def api_fixtures(handler, round_id=None):
             JOIN rounds r ON r.id=f.round_id
             ORDER BY r.round_number, f.kickoff
         """).fetchall()
-    conn.close()
-    return json_response(handler, [dict(r) for r in rows])
+    ])
 
+def round_closed_reason(fixture, now):
+    if fixture["round_status"] not in ("upcoming", "open"):
+        return "Round is closed"
+    try:
+        dl = datetime.fromisoformat(fixture["deadline"])
+    except (TypeError, ValueError):
+        return None  # unparseable deadline: status alone decides
+    if dl.tzinfo:
+        now = now.astimezone(dl.tzinfo)
+    if now > dl:
+        return "Deadline has passed"
+    return None
+
+@route("POST", "/api/tips")
 def api_submit_tips(handler):
     u = get_user(handler)
     if not u:
@@ -276,84 +1647,311 @@ def api_submit_tips(handler):
     tips = data.get("tips", [])
     if not tips:
         return json_response(handler, {"error": "No tips provided"}, 400)
-    conn = db()
-    for tip in tips:
-        fixture = conn.execute("""
-            SELECT f.*, r.status round_status, r.deadline
-            FROM fixtures f JOIN rounds r ON r.id=f.round_id
-            WHERE f.id=?
-        """, (tip["fixture_id"],)).fetchone()
-        if not fixture:
-            continue
-        if fixture["round_status"] not in ("upcoming", "open"):
-            continue
-        # Check deadline
-        try:
-            dl = datetime.fromisoformat(fixture["deadline"])
-            if datetime.now() > dl:
-                continue
-        except:
-            pass
-        conn.execute("""
-            INSERT INTO tips (user_id, fixture_id, predicted_winner_id, predicted_margin)
-            VALUES (?,?,?,?)
-            ON CONFLICT(user_id, fixture_id) DO UPDATE SET
-                predicted_winner_id=excluded.predicted_winner_id,
-                predicted_margin=excluded.predicted_margin
-        """, (u["user_id"], tip["fixture_id"], tip["predicted_winner_id"], tip.get("predicted_margin", 0)))
-    conn.commit()
-    conn.close()
-    return json_response(handler, {"success": True})
-
+    tips = [t if isinstance(t, dict) else {} for t in tips]
+    ids = list({t.get("fixture_id") for t in tips if type(t.get("fixture_id")) is int})
+    with db() as conn:
+        fixtures = {}
+        if ids:
+            fixtures = {f["id"]: f for f in conn.execute(f"""
+                SELECT f.id, f.round_id, f.home_team_id, f.away_team_id, r.status round_status, r.deadline
+                FROM fixtures f JOIN rounds r ON r.id=f.round_id
+                WHERE f.id IN ({",".join("?" * len(ids))})
+            """, ids)}
+        # Each round's status and deadline is checked once, not once per tip
+        now = datetime.now()
+        closed = {}
+        for f in fixtures.values():
+            if f["round_id"] not in closed:
+                closed[f["round_id"]] = round_closed_reason(f, now)
+        accepted, rejected = {}, []
+        for tip in tips:
+            fid = tip.get("fixture_id")
+            fixture = fixtures.get(fid)
+            winner = tip.get("predicted_winner_id")
+            margin = tip.get("predicted_margin", 0)
+            if fixture is None:
+                reason = "Fixture not found"
+            elif closed[fixture["round_id"]]:
+                reason = closed[fixture["round_id"]]
+            elif winner not in (fixture["home_team_id"], fixture["away_team_id"]):
+                reason = "Winner must be one of the two teams"
+            elif type(margin) is not int:
+                reason = "Invalid margin"
+            else:
+                reason = None
+            if reason:
+                rejected.append({"fixture_id": fid, "reason": reason})
+            else:
+                accepted[fid] = (u["user_id"], fid, winner, margin)  # last tip for a fixture wins
+        if accepted:
+            conn.executemany("""
+                INSERT INTO tips (user_id, fixture_id, predicted_winner_id, predicted_margin)
+                VALUES (?,?,?,?)
+                ON CONFLICT(user_id, fixture_id) DO UPDATE SET
+                    predicted_winner_id=excluded.predicted_winner_id,
+                    predicted_margin=excluded.predicted_margin
+            """, list(accepted.values()))
+            refresh_tip_count(conn, u["user_id"])
+            conn.commit()
+            versions.bump("tips")
+    return json_response(handler, {"success": True, "accepted": list(accepted), "rejected": rejected})
+
+@route("GET", "/api/tips/round/<int:round_id>")
 def api_my_tips(handler, round_id):
     u = get_user(handler)
     if not u:
         return json_response(handler, {"error": "Not authenticated"}, 401)
-    conn = db()
-    tips = [dict(r) for r in conn.execute("""
-        SELECT t.*, f.home_team_id, f.away_team_id
-        FROM tips t JOIN fixtures f ON f.id=t.fixture_id
-        WHERE t.user_id=? AND f.round_id=?
-    """, (u["user_id"], round_id)).fetchall()]
-    conn.close()
+    with db() as conn:
+        tips = [dict(r) for r in conn.execute("""
+            SELECT t.*, f.home_team_id, f.away_team_id
+            FROM tips t JOIN fixtures f ON f.id=t.fixture_id
+            WHERE t.user_id=? AND f.round_id=?
+        """, (u["user_id"], round_id)).fetchall()]
     return json_response(handler, tips)
 
+# Leaderboard order is (total_points DESC, correct_tips DESC, user_id): that
+# is idx_user_totals_rank plus its implicit rowid, so a page is an index range
+# read from the cursor, never a sort. A cursor is the last row's key,
+# "points.correct.user_id".
+LEADERBOARD_AFTER = """ut.total_points <= ? AND (ut.total_points < ? OR (ut.total_points = ?
+    AND (ut.correct_tips < ? OR (ut.correct_tips = ? AND ut.user_id > ?))))"""
+LEADERBOARD_BEFORE = """ut.total_points >= ? AND (ut.total_points > ? OR (ut.total_points = ?
+    AND (ut.correct_tips > ? OR (ut.correct_tips = ? AND ut.user_id < ?))))"""
+# CROSS JOIN keeps user_totals as the outer loop so rows come out in index order
+LEADERBOARD_ROWS = """
+    SELECT u.id, u.display_name, ut.total_points, ut.total_tips, ut.correct_tips
+    FROM user_totals ut CROSS JOIN users u ON u.id=ut.user_id
+    WHERE u.is_admin=0 {where}
+    ORDER BY ut.total_points {order}, ut.correct_tips {order}, ut.user_id {tiebreak}
+    LIMIT ?
+"""
+
+def key_args(points, correct, user_id):
+    return (points, points, points, correct, correct, user_id)
+
+def page_params(handler):
+    # (limit, cursor key or None), or None after answering 400
+    limit = handler.query.get("limit", [str(LEADERBOARD_PAGE)])[0]
+    cursor = handler.query.get("cursor", [""])[0]
+    if not is_whole_number(limit) or not 1 <= int(limit) <= LEADERBOARD_MAX_PAGE:
+        json_response(handler, {"error": f"limit must be 1-{LEADERBOARD_MAX_PAGE}"}, 400)
+        return None
+    key = tuple(cursor.split(".")) if cursor else None
+    if key and (len(key) != 3 or not all(is_whole_number(k) for k in key)):
+        json_response(handler, {"error": "Invalid cursor"}, 400)
+        return None
+    return int(limit), key and tuple(map(int, key))
+
+def leaderboard_cursor(row):
+    return f"{row['total_points']}.{row['correct_tips']}.{row['id']}"
+
+def leaderboard_position(conn, points, correct, user_id):
+    # Competition rank (1 + players strictly ahead) and position (1 + players
+    # ahead in page order) of a leaderboard key. Both are range counts on the
+    # rank index, less the few admins in the same range.
+    sql = f"""SELECT COUNT(*), COALESCE(SUM(NOT (ut.total_points=? AND ut.correct_tips=?)), 0)
+              FROM {{}} WHERE {LEADERBOARD_BEFORE}"""
+    args = (points, correct, *key_args(points, correct, user_id))
+    ahead, strictly = conn.execute(sql.format("user_totals ut"), args).fetchone()
+    admins, admins_strictly = conn.execute(
+        sql.format("users u JOIN user_totals ut ON ut.user_id=u.id") + " AND u.is_admin=1", args
+    ).fetchone()
+    return strictly - admins_strictly + 1, ahead - admins + 1
+
+def rank_rows(rows, rank, position):
+    # rows are in leaderboard order and the first has the given rank/position;
+    # tied rows share a rank, the next distinct row takes its position
+    prev = None
+    for i, r in enumerate(rows):
+        key = (r["total_points"], r["correct_tips"])
+        if prev is not None and key != prev:
+            rank = position + i
+        r["rank"] = rank
+        prev = key
+    return rows
+
+@route("GET", "/api/leaderboard")
 def api_leaderboard(handler):
-    conn = db()
-    rows = [dict(r) for r in conn.execute("""
-        SELECT u.id, u.display_name,
-               COALESCE(SUM(t.points_earned), 0) total_points,
-               COUNT(t.id) total_tips,
-               SUM(CASE WHEN t.points_earned > 0 THEN 1 ELSE 0 END) correct_tips
-        FROM users u
-        LEFT JOIN tips t ON t.user_id=u.id
-        WHERE u.is_admin=0
-        GROUP BY u.id
-        ORDER BY total_points DESC, correct_tips DESC
-    """).fetchall()]
-    conn.close()
-    return json_response(handler, rows)
+    page = page_params(handler)
+    if not page: return
+    limit, after = page
+
+    def build(conn):
+        sql = LEADERBOARD_ROWS.format(where=f"AND {LEADERBOARD_AFTER}" if after else "",
+                                      order="DESC", tiebreak="ASC")
+        rows = [dict(r) for r in conn.execute(sql, (*(key_args(*after) if after else ()), limit + 1))]
+        more = len(rows) > limit
+        rows = rows[:limit]
+        if rows:
+            first = rows[0]
+            rank_rows(rows, *(leaderboard_position(conn, first["total_points"], first["correct_tips"], first["id"])
+                              if after else (1, 1)))
+        return {"rows": rows, "next_cursor": leaderboard_cursor(rows[-1]) if more else None}
+
+    return cached_json(handler, ("leaderboard", limit, after), ("leaderboard", "tips"), build)
+
+@route("GET", "/api/leaderboard/me")
+def api_leaderboard_me(handler):
+    # The caller's rank and the players either side of them
+    u = get_user(handler)
+    if not u:
+        return json_response(handler, {"error": "Not authenticated"}, 401)
+    around = handler.query.get("around", ["5"])[0]
+    around = min(int(around), 50) if is_whole_number(around) else 5
+    with db() as conn:
+        me = conn.execute("""
+            SELECT u.id, u.display_name, ut.total_points, ut.total_tips, ut.correct_tips, u.is_admin
+            FROM user_totals ut JOIN users u ON u.id=ut.user_id
+            WHERE ut.user_id=?
+        """, (u["user_id"],)).fetchone()
+        if not me or me["is_admin"]:
+            return json_response(handler, {"error": "Not on the leaderboard"}, 404)
+        me = dict(me)
+        del me["is_admin"]
+        key = key_args(me["total_points"], me["correct_tips"], me["id"])
+        above = [dict(r) for r in conn.execute(
+            LEADERBOARD_ROWS.format(where=f"AND {LEADERBOARD_BEFORE}", order="ASC", tiebreak="DESC"), (*key, around)
+        )][::-1]
+        below = [dict(r) for r in conn.execute(
+            LEADERBOARD_ROWS.format(where=f"AND {LEADERBOARD_AFTER}", order="DESC", tiebreak="ASC"), (*key, around)
+        )]
+        rows = above + [me] + below
+        first = rows[0]
+        rank_rows(rows, *leaderboard_position(conn, first["total_points"], first["correct_tips"], first["id"]))
+        players = conn.execute("""
+            SELECT (SELECT COUNT(*) FROM user_totals)
+                 - (SELECT COUNT(*) FROM users u JOIN user_totals ut ON ut.user_id=u.id WHERE u.is_admin=1)
+        """).fetchone()[0]
+    return json_response(handler, {"rank": me["rank"], "players": players, "me": me, "rows": rows})
+
+# Snapshots page like the live leaderboard, by the same key on idx_standings_rank
+STANDINGS_ROWS = """
+    SELECT u.id, u.display_name, ut.rank, ut.rank_change, ut.total_points, ut.correct_tips, ut.round_points
+    FROM standings ut CROSS JOIN users u ON u.id=ut.user_id
+    WHERE ut.round_id=? {where}
+    ORDER BY ut.total_points DESC, ut.correct_tips DESC, ut.user_id
+    LIMIT ?
+"""
 
+@route("GET", "/api/rounds/<int:round_id>/standings")
+def api_round_standings(handler, round_id):
+    # The table as it stood when the round was completed; empty until then
+    page = page_params(handler)
+    if not page: return
+    limit, after = page
+
+    def build(conn):
+        sql = STANDINGS_ROWS.format(where=f"AND {LEADERBOARD_AFTER}" if after else "")
+        rows = [dict(r) for r in conn.execute(sql, (round_id, *(key_args(*after) if after else ()), limit + 1))]
+        more = len(rows) > limit
+        rows = rows[:limit]
+        return {"rows": rows, "next_cursor": leaderboard_cursor(rows[-1]) if more else None}
+
+    return cached_json(handler, ("standings", round_id, limit, after), ("standings",), build)
+
+@route("GET", "/api/users/<int:user_id>/history")
+def api_user_history(handler, user_id):
+    # A player's points per round, with their rank and movement in each snapshot
+    return cached_json(handler, ("history", user_id), ("rounds", "standings"), lambda conn: [
+        dict(r) for r in conn.execute("""
+            SELECT r.id round_id, r.round_number, r.name, r.status,
+                   COALESCE(rs.points, 0) points, COALESCE(rs.correct_tips, 0) correct_tips,
+                   s.rank, s.rank_change, s.total_points
+            FROM rounds r
+            LEFT JOIN round_scores rs ON rs.round_id=r.id AND rs.user_id=?
+            LEFT JOIN standings s ON s.round_id=r.id AND s.user_id=?
+            WHERE r.status='completed' OR rs.round_id IS NOT NULL
+            ORDER BY r.round_number, r.id
+        """, (user_id, user_id)).fetchall()
+    ])
+
+@route("GET", "/api/stream")
+def api_stream(handler):
+    # Server-Sent Events: result, round and leaderboard changes as they happen
+    if not stream_hub.reserve():
+        return json_response(handler, {"error": "Too many live connections"}, 503, headers={"Retry-After": 30})
+    try:
+        handler.close_connection = True  # the stream runs until either side hangs up
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.send_header("Cache-Control", "no-cache")
+        handler.end_headers()
+        handler.wfile.write(b"retry: 5000\n\n")
+        handler.start_stream()
+    except Exception:
+        stream_hub.release()
+        raise
+
+@route("GET", "/api/groups/<int:group_id>/leaderboard")
 def api_group_leaderboard(handler, group_id):
     u = get_user(handler)
     if not u:
         return json_response(handler, {"error": "Not authenticated"}, 401)
-    conn = db()
-    rows = [dict(r) for r in conn.execute("""
-        SELECT u.id, u.display_name,
-               COALESCE(SUM(t.points_earned), 0) total_points,
-               COUNT(t.id) total_tips,
-               SUM(CASE WHEN t.points_earned > 0 THEN 1 ELSE 0 END) correct_tips
-        FROM group_members gm
-        JOIN users u ON u.id=gm.user_id
-        LEFT JOIN tips t ON t.user_id=u.id
-        WHERE gm.group_id=?
-        GROUP BY u.id
-        ORDER BY total_points DESC, correct_tips DESC
-    """, (group_id,)).fetchall()]
-    conn.close()
-    return json_response(handler, rows)
-
+    page = page_params(handler)
+    if not page: return
+    limit, after = page
+    with db() as conn:
+        # Members' standings are their user_totals rows; groups are small, so
+        # they are ranked in SQL and then paged by the same key
+        rows = [dict(r) for r in conn.execute(f"""
+            SELECT user_id id, display_name, total_points, total_tips, correct_tips, rank
+            FROM (
+                SELECT ut.user_id, u.display_name, ut.total_points, ut.total_tips, ut.correct_tips,
+                       RANK() OVER (ORDER BY ut.total_points DESC, ut.correct_tips DESC) rank
+                FROM group_members gm
+                JOIN users u ON u.id=gm.user_id
+                JOIN user_totals ut ON ut.user_id=gm.user_id
+                WHERE gm.group_id=?
+            ) ut
+            {"WHERE " + LEADERBOARD_AFTER if after else ""}
+            ORDER BY total_points DESC, correct_tips DESC, user_id
+            LIMIT ?
+        """, (group_id, *(key_args(*after) if after else ()), limit + 1))]
+    more = len(rows) > limit
+    rows = rows[:limit]
+    return json_response(handler, {"rows": rows, "next_cursor": leaderboard_cursor(rows[-1]) if more else None})
+
+@route("GET", "/api/groups/leaderboards")
+def api_my_group_leaderboards(handler):
+    # The top N of every group the caller is in, plus their own row, in one query
+    u = get_user(handler)
+    if not u:
+        return json_response(handler, {"error": "Not authenticated"}, 401)
+    top = handler.query.get("top", ["5"])[0]
+    top = max(1, min(int(top), 50)) if is_whole_number(top) else 5
+    with db() as conn:
+        rows = conn.execute("""
+            SELECT * FROM (
+                SELECT g.id group_id, g.name, g.code, g.member_count,
+                       ut.user_id id, u.display_name, ut.total_points, ut.total_tips, ut.correct_tips,
+                       RANK() OVER standing rank,
+                       ROW_NUMBER() OVER page_order n
+                FROM group_members mine
+                JOIN groups_ g ON g.id=mine.group_id
+                JOIN group_members gm ON gm.group_id=mine.group_id
+                JOIN users u ON u.id=gm.user_id
+                JOIN user_totals ut ON ut.user_id=gm.user_id
+                WHERE mine.user_id=?
+                WINDOW standing AS (PARTITION BY g.id ORDER BY ut.total_points DESC, ut.correct_tips DESC),
+                       page_order AS (PARTITION BY g.id ORDER BY ut.total_points DESC, ut.correct_tips DESC, ut.user_id)
+            )
+            WHERE n <= ? OR id = ?
+            ORDER BY name, group_id, n
+        """, (u["user_id"], top, u["user_id"])).fetchall()
+    groups = {}
+    for r in rows:
+        g = groups.get(r["group_id"])
+        if g is None:
+            g = groups[r["group_id"]] = {"id": r["group_id"], "name": r["name"], "code": r["code"],
+                                         "member_count": r["member_count"], "rows": [], "me": None}
+        row = {k: r[k] for k in ("id", "display_name", "total_points", "total_tips", "correct_tips", "rank")}
+        if r["n"] <= top:
+            g["rows"].append(row)
+        if r["id"] == u["user_id"]:
+            g["me"] = row
+    return json_response(handler, list(groups.values()))
+
+@route("POST", "/api/groups/create")
 def api_create_group(handler):
     u = get_user(handler)
     if not u:
@@ -363,46 +1961,46 @@ def api_create_group(handler):
     if not name:
         return json_response(handler, {"error": "Group name required"}, 400)
     code = secrets.token_hex(3).upper()
-    conn = db()
-    conn.execute("INSERT INTO groups_ (name, code, created_by) VALUES (?,?,?)", (name, code, u["user_id"]))
-    gid = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
-    conn.execute("INSERT INTO group_members (group_id, user_id) VALUES (?,?)", (gid, u["user_id"]))
-    conn.commit()
-    conn.close()
+    with db() as conn:
+        conn.execute("INSERT INTO groups_ (name, code, created_by, member_count) VALUES (?,?,?,1)",
+                     (name, code, u["user_id"]))
+        gid = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+        conn.execute("INSERT INTO group_members (group_id, user_id) VALUES (?,?)", (gid, u["user_id"]))
+        conn.commit()
     return json_response(handler, {"id": gid, "name": name, "code": code})
 
+@route("POST", "/api/groups/join")
 def api_join_group(handler):
     u = get_user(handler)
     if not u:
         return json_response(handler, {"error": "Not authenticated"}, 401)
     data = read_body(handler)
     code = (data.get("code") or "").strip().upper()
-    conn = db()
-    group = conn.execute("SELECT * FROM groups_ WHERE code=?", (code,)).fetchone()
-    if not group:
-        conn.close()
-        return json_response(handler, {"error": "Invalid group code"}, 404)
-    try:
-        conn.execute("INSERT INTO group_members (group_id, user_id) VALUES (?,?)", (group["id"], u["user_id"]))
-        conn.commit()
-    except sqlite3.IntegrityError:
-        pass
-    conn.close()
+    with db() as conn:
+        group = conn.execute("SELECT * FROM groups_ WHERE code=?", (code,)).fetchone()
+        if not group:
+            return json_response(handler, {"error": "Invalid group code"}, 404)
+        try:
+            conn.execute("INSERT INTO group_members (group_id, user_id) VALUES (?,?)", (group["id"], u["user_id"]))
+            conn.execute("UPDATE groups_ SET member_count = member_count + 1 WHERE id=?", (group["id"],))
+            conn.commit()
+        except sqlite3.IntegrityError:
+            pass
     return json_response(handler, {"success": True, "group": dict(group)})
 
+@route("GET", "/api/groups")
 def api_my_groups(handler):
     u = get_user(handler)
     if not u:
         return json_response(handler, {"error": "Not authenticated"}, 401)
-    conn = db()
-    groups = [dict(r) for r in conn.execute("""
-        SELECT g.*, (SELECT COUNT(*) FROM group_members WHERE group_id=g.id) member_count
-        FROM groups_ g
-        JOIN group_members gm ON gm.group_id=g.id
-        WHERE gm.user_id=?
-        ORDER BY g.name
-    """, (u["user_id"],)).fetchall()]
-    conn.close()
+    with db() as conn:
+        groups = [dict(r) for r in conn.execute("""
+            SELECT g.*
+            FROM groups_ g
+            JOIN group_members gm ON gm.group_id=g.id
+            WHERE gm.user_id=?
+            ORDER BY g.name
+        """, (u["user_id"],)).fetchall()]
     return json_response(handler, groups)
 
 
@@ -415,30 +2013,107 @@ def require_admin(handler):
         return None
     return u
 
+@route("GET", "/api/admin/stats")
+def admin_stats(handler):
+    if not require_admin(handler): return
+    return json_response(handler, {
+        "db_pool": pool.stats(),
+        "sessions": sessions.stats(),
+        "response_cache": response_cache.stats(),
+        "streams": stream_hub.stats(),
+        "backups": backups.stats(),
+    })
+
+@route("GET", "/api/admin/backups")
+def admin_backups(handler):
+    if not require_admin(handler): return
+    return json_response(handler, backups.status())
+
+@route("POST", "/api/admin/backups")
+def admin_start_backup(handler):
+    # Starts a backup and answers straight away; poll GET for its progress
+    if not require_admin(handler): return
+    if not backups.start():
+        return json_response(handler, {"error": "A backup is already running", **backups.status()}, 409)
+    return json_response(handler, backups.status(), 202)
+
+@route("GET", "/api/admin/metrics")
+def admin_metrics(handler):
+    if not require_admin(handler): return
+    if handler.query.get("format") == ["prometheus"] or "text/plain" in handler.headers.get("Accept", ""):
+        body = metrics.prometheus().encode()
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/plain; version=0.0.4")
+        handler.send_header("Content-Length", len(body))
+        handler.end_headers()
+        handler.wfile.write(body)
+        return
+    return json_response(handler, metrics.snapshot())
+
+@route("GET", "/api/admin/slow-queries")
+def admin_slow_queries(handler):
+    if not require_admin(handler): return
+    top = handler.query.get("top", ["25"])[0]
+    return json_response(handler, profiler.report(int(top) if is_whole_number(top) else 25))
+
+@route("PUT", "/api/admin/slow-queries")
+def admin_configure_profiler(handler):
+    if not require_admin(handler): return
+    data = read_body(handler)
+    threshold = data.get("threshold_ms")
+    if threshold is not None and (type(threshold) not in (int, float) or threshold < 0):
+        return json_response(handler, {"error": "threshold_ms must be a non-negative number"}, 400)
+    profiler.configure(data.get("enabled"), threshold)
+    return json_response(handler, {"enabled": profiler.enabled, "threshold_ms": profiler.threshold_ms})
+
+@route("DELETE", "/api/admin/slow-queries")
+def admin_clear_slow_queries(handler):
+    if not require_admin(handler): return
+    profiler.clear()
+    return json_response(handler, {"success": True})
+
+@route("GET", "/api/admin/users")
 def admin_users(handler):
     if not require_admin(handler): return
-    conn = db()
-    users = [dict(r) for r in conn.execute("SELECT id, email, display_name, is_admin, created_at FROM users ORDER BY display_name").fetchall()]
-    conn.close()
+    with db() as conn:
+        users = [dict(r) for r in conn.execute("SELECT id, email, display_name, is_admin, created_at FROM users ORDER BY display_name").fetchall()]
     return json_response(handler, users)
 
+def publish_round(conn, round_id):
+    row = conn.execute("SELECT * FROM rounds WHERE id=?", (round_id,)).fetchone()
+    if row:
+        stream_hub.publish("round", dict(row))
+
+def publish_results(conn, fixture_ids):
+    marks = ",".join("?" * len(fixture_ids))
+    rows = conn.execute(
+        f"SELECT id, round_id, home_score, away_score FROM fixtures WHERE id IN ({marks})", fixture_ids
+    ).fetchall()
+    for round_id in sorted({r["round_id"] for r in rows}):
+        stream_hub.publish("result", {"round_id": round_id, "fixtures": [
+            {"id": r["id"], "home_score": r["home_score"], "away_score": r["away_score"]}
+            for r in rows if r["round_id"] == round_id
+        ]})
+
+@route("POST", "/api/admin/rounds")
 def admin_create_round(handler):
     if not require_admin(handler): return
     data = read_body(handler)
-    conn = db()
-    conn.execute(
-        "INSERT INTO rounds (round_number, name, deadline, status) VALUES (?,?,?,?)",
-        (data["round_number"], data["name"], data["deadline"], data.get("status", "upcoming"))
-    )
-    conn.commit()
-    rid = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
-    conn.close()
+    with db() as conn:
+        conn.execute(
+            "INSERT INTO rounds (round_number, name, deadline, status) VALUES (?,?,?,?)",
+            (data["round_number"], data["name"], data["deadline"], data.get("status", "upcoming"))
+        )
+        conn.commit()
+        versions.bump("rounds")
+        rid = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+        publish_round(conn, rid)
     return json_response(handler, {"id": rid}, 201)
 
+@route("PUT", "/api/admin/rounds/<int:round_id>")
 def admin_update_round(handler, round_id):
     if not require_admin(handler): return
     data = read_body(handler)
-    conn = db()
     sets = []
     vals = []
     for k in ("name", "deadline", "status", "round_number"):
@@ -447,93 +2122,422 @@ def admin_update_round(handler, round_id):
             vals.append(data[k])
     if sets:
         vals.append(round_id)
-        conn.execute(f"UPDATE rounds SET {','.join(sets)} WHERE id=?", vals)
-        conn.commit()
-    conn.close()
+        with db() as conn:
+            lookup = "SELECT status, round_number FROM rounds WHERE id=?"
+            before = conn.execute(lookup, (round_id,)).fetchone()
+            conn.execute(f"UPDATE rounds SET {','.join(sets)} WHERE id=?", vals)
+            after = conn.execute(lookup, (round_id,)).fetchone()
+            # Completing a round freezes its standings and reopening it drops
+            # them; either way (or renumbering a completed round) every later
+            # snapshot builds on it, so those are retaken too
+            stale = before and tuple(before) != tuple(after) and \
+                "completed" in (before["status"], after["status"])
+            if stale:
+                conn.execute("DELETE FROM standings WHERE round_id=?", (round_id,))
+                rebuild_standings(conn, min(before["round_number"], after["round_number"]))
+            conn.commit()
+            versions.bump("rounds", *(("standings",) if stale else ()))
+            if "status" in data:
+                publish_round(conn, round_id)
     return json_response(handler, {"success": True})
 
+@route("POST", "/api/admin/fixtures")
 def admin_create_fixture(handler):
     if not require_admin(handler): return
     data = read_body(handler)
-    conn = db()
-    conn.execute(
-        "INSERT INTO fixtures (round_id, home_team_id, away_team_id, venue, kickoff) VALUES (?,?,?,?,?)",
-        (data["round_id"], data["home_team_id"], data["away_team_id"], data.get("venue",""), data.get("kickoff",""))
-    )
-    conn.commit()
-    fid = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
-    conn.close()
+    with db() as conn:
+        conn.execute(
+            "INSERT INTO fixtures (round_id, home_team_id, away_team_id, venue, kickoff) VALUES (?,?,?,?,?)",
+            (data["round_id"], data["home_team_id"], data["away_team_id"], data.get("venue",""), data.get("kickoff",""))
+        )
+        conn.commit()
+        versions.bump("fixtures")
+        fid = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
     return json_response(handler, {"id": fid}, 201)
 
+# Season draw import: one row per fixture. A round number that is not in the
+# database yet becomes a new round, from the first row that gives its deadline.
+DRAW_FORMATS = {"text/csv": "csv", "application/x-ndjson": "ndjson", "application/jsonl": "ndjson",
+                "application/json": "json"}
+DRAW_ROUND_STATUSES = ("upcoming", "open", "closed")
+
+def draw_rows(handler, fmt):
+    # (row number, row, error) per fixture; CSV and NDJSON are parsed as they
+    # arrive, one fixture per line, so a bad line is reported and skipped
+    too_long = f"Line is longer than {IMPORT_LINE_BYTES} bytes"
+    if fmt == "csv":
+        lines = body_lines(handler)
+        header = next(lines, "")
+        if header is None:
+            yield 0, None, too_long
+            return
+        try:
+            header = [h.strip().lstrip("\ufeff").lower() for h in next(csv.reader([header]), [])]
+        except csv.Error as e:
+            yield 0, None, f"Invalid CSV header: {e}"
+            return
+        for n, line in enumerate(lines, 1):
+            if line is None:
+                yield n, None, too_long
+                continue
+            try:
+                values = next(csv.reader([line]), [])
+            except csv.Error as e:
+                yield n, None, f"Invalid CSV: {e}"
+                continue
+            if any(v.strip() for v in values):
+                yield n, dict(zip(header, values)), None
+    elif fmt == "ndjson":
+        n = 0
+        for line in body_lines(handler):
+            if line is not None and not line.strip():
+                continue
+            n += 1
+            if line is None:
+                yield n, None, too_long
+                continue
+            try:
+                yield n, json.loads(line), None
+            except json.JSONDecodeError as e:
+                yield n, None, f"Invalid JSON: {e.msg}"
+    else:
+        data = read_body(handler)
+        rows = data.get("fixtures", []) if isinstance(data, dict) else data
+        if not isinstance(rows, list):
+            raise ValueError('Body must be a list of fixtures or {"fixtures": [...]}')
+        for n, row in enumerate(rows, 1):
+            yield n, row, None
+
+def is_iso_datetime(value):
+    try:
+        datetime.fromisoformat(value)
+        return True
+    except ValueError:
+        return False
+
+@route("POST", "/api/admin/import/draw")
+def admin_import_draw(handler):
+    # Rows: round_number, home, away, venue, kickoff, and for new rounds
+    # round_name, deadline, round_status. Everything is checked before
+    # anything is written; ?dry_run=1 stops after the checks.
+    if not require_admin(handler): return
+    content_type = handler.headers.get("Content-Type", "").split(";")[0].strip().lower()
+    fmt = handler.query.get("format", [DRAW_FORMATS.get(content_type, "json")])[0]
+    if fmt not in ("csv", "ndjson", "json"):
+        return json_response(handler, {"error": "format must be csv, ndjson or json"}, 400)
+    dry_run = handler.query.get("dry_run", ["0"])[0] in ("1", "true")
+    with db() as conn:
+        # Names and short names, case-insensitively; a full name wins a clash
+        team_rows = conn.execute("SELECT id, name, short_name FROM teams ORDER BY id").fetchall()
+        teams = {t["name"].casefold(): t["id"] for t in team_rows}
+        for t in team_rows:
+            teams.setdefault(t["short_name"].casefold(), t["id"])
+        round_ids = {}
+        for r in conn.execute("SELECT id, round_number FROM rounds ORDER BY id"):
+            round_ids.setdefault(r["round_number"], []).append(r["id"])
+        existing = {tuple(f) for f in conn.execute("SELECT round_id, home_team_id, away_team_id FROM fixtures")}
+        new_rounds = {}  # round_number -> [name, deadline, status]
+        fixtures, seen, errors, rows = [], set(), [], 0
+
+        try:
+            for n, row, error in draw_rows(handler, fmt):
+                rows = n
+                if error or not isinstance(row, dict):
+                    errors.append({"row": n, "error": error or "Row must be an object"})
+                    continue
+                row = {str(k).strip().lower(): "" if v is None else str(v).strip() for k, v in row.items()}
+                number, venue, kickoff = row.get("round_number", ""), row.get("venue", ""), row.get("kickoff", "")
+                home, away = teams.get(row.get("home", "").casefold()), teams.get(row.get("away", "").casefold())
+                details = [row.get("round_name", ""), row.get("deadline", ""), row.get("round_status", "")]
+                error = None
+                if not number.isdecimal() or int(number) < 1:
+                    error = "round_number must be a positive whole number"
+                elif home is None:
+                    error = f"Unknown home team {row.get('home', '')!r}"
+                elif away is None:
+                    error = f"Unknown away team {row.get('away', '')!r}"
+                elif home == away:
+                    error = "Home and away must be different"
+                elif kickoff and not is_iso_datetime(kickoff):
+                    error = "kickoff must be an ISO date and time"
+                elif len(round_ids.get(int(number), [])) > 1:
+                    error = f"Round {number} matches more than one round"
+                elif int(number) not in round_ids:
+                    # A new round: the first row to mention it needs a deadline, later ones must agree
+                    number = int(number)
+                    known = new_rounds.get(number)
+                    if details[1] and not is_iso_datetime(details[1]):
+                        error = "deadline must be an ISO date and time"
+                    elif details[2] and details[2] not in DRAW_ROUND_STATUSES:
+                        error = f"round_status must be one of {', '.join(DRAW_ROUND_STATUSES)}"
+                    elif known is None and not details[1]:
+                        error = f"Round {number} is new, so it needs a deadline"
+                    elif known and any(d and d != k for d, k in zip(details, known)):
+                        error = f"Round {number} details differ from an earlier row"
+                    elif known is None:
+                        new_rounds[number] = [details[0] or f"Round {number}", details[1], details[2] or "upcoming"]
+                if not error:
+                    number = int(number)
+                    round_id = round_ids.get(number, [None])[0]
+                    if (number, home, away) in seen or (round_id, home, away) in existing:
+                        error = "Duplicate fixture"
+                    else:
+                        seen.add((number, home, away))
+                        fixtures.append((round_id, number, home, away, venue, kickoff))
+                if error:
+                    errors.append({"row": n, "error": error})
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return json_response(handler, {"error": "Invalid JSON"}, 400)
+        except ValueError as e:
+            return json_response(handler, {"error": str(e)}, 400)
+
+        if errors:
+            return json_response(handler, {"error": "Invalid draw", "details": errors, "rows": rows}, 400)
+        if not fixtures:
+            return json_response(handler, {"error": "No fixtures provided"}, 400)
+        created = {}
+        if not dry_run:
+            conn.executemany("INSERT INTO rounds (round_number, name, deadline, status) VALUES (?,?,?,?)",
+                             [(number, *d) for number, d in new_rounds.items()])
+            if new_rounds:
+                created = dict(conn.execute(
+                    f"SELECT round_number, id FROM rounds WHERE round_number IN ({','.join('?' * len(new_rounds))})",
+                    list(new_rounds)
+                ).fetchall())
+            conn.executemany(
+                "INSERT INTO fixtures (round_id, home_team_id, away_team_id, venue, kickoff) VALUES (?,?,?,?,?)",
+                [(round_id or created[number], home, away, venue, kickoff)
+                 for round_id, number, home, away, venue, kickoff in fixtures]
+            )
+            conn.commit()
+            versions.bump("rounds", "fixtures")
+            for rid in created.values():
+                publish_round(conn, rid)
+    return json_response(handler, {"success": True, "dry_run": dry_run, "rows": rows,
+                                   "rounds_created": len(new_rounds), "fixtures_created": len(fixtures)})
+
+# Exports are streamed from the cursor: EXPORT_BATCH rows are fetched,
+# encoded and written as one chunk, so memory stays flat whatever the size.
+# The exports that can be large (users, all tips, a round's or a group's
+# tips, the live leaderboard) are ORDERed the way their plan already reads,
+# so they stream without a temp b-tree. Fixtures, a round's tips within a
+# group and a group's leaderboard are sorted, but those are small. One read
+# transaction covers the whole export.
+def export_query(kind, round_id, group_id):
+    members = "JOIN group_members gm ON gm.user_id={} AND gm.group_id=?"
+    if kind == "users":
+        return f"""
+            SELECT u.id, u.email, u.display_name, u.is_admin, t.short_name fav_team, u.created_at,
+                   ut.total_points, ut.total_tips, ut.correct_tips
+            FROM users u
+            {members.format("u.id") if group_id else ""}
+            LEFT JOIN teams t ON t.id=u.fav_team_id
+            LEFT JOIN user_totals ut ON ut.user_id=u.id
+            ORDER BY {"gm.user_id" if group_id else "u.id"}
+        """, [group_id] if group_id else []
+    if kind == "tips":
+        where, order = [], "t.fixture_id, t.user_id"
+        if round_id:
+            where.append("f.round_id=?")
+            order = "f.kickoff, f.id, t.user_id"
+        if group_id:
+            order = "gm.user_id, t.fixture_id"
+        return f"""
+            SELECT t.id, t.user_id, u.display_name, r.round_number, t.fixture_id,
+                   ht.short_name home, at.short_name away, pw.short_name predicted_winner,
+                   t.predicted_margin, t.points_earned, t.created_at
+            FROM tips t
+            {members.format("t.user_id") if group_id else ""}
+            JOIN fixtures f ON f.id=t.fixture_id
+            JOIN rounds r ON r.id=f.round_id
+            JOIN users u ON u.id=t.user_id
+            JOIN teams ht ON ht.id=f.home_team_id
+            JOIN teams at ON at.id=f.away_team_id
+            JOIN teams pw ON pw.id=t.predicted_winner_id
+            {"WHERE " + " AND ".join(where) if where else ""}
+            ORDER BY {order}
+        """, [x for x in (group_id, round_id) if x]
+    if kind == "fixtures":
+        return f"""
+            SELECT f.id, r.round_number, r.name round_name, ht.short_name home, at.short_name away,
+                   f.home_score, f.away_score, f.venue, f.kickoff, f.status
+            FROM fixtures f
+            JOIN rounds r ON r.id=f.round_id
+            JOIN teams ht ON ht.id=f.home_team_id
+            JOIN teams at ON at.id=f.away_team_id
+            {"WHERE f.round_id=?" if round_id else ""}
+            ORDER BY r.round_number, f.kickoff, f.id
+        """, [round_id] if round_id else []
+    if round_id:
+        # The leaderboard as frozen when that round was completed
+        return f"""
+            SELECT s.rank, u.id, u.display_name, s.total_points, s.correct_tips, s.round_points, s.rank_change
+            FROM standings s CROSS JOIN users u ON u.id=s.user_id
+            {members.format("s.user_id") if group_id else ""}
+            WHERE s.round_id=?
+            ORDER BY s.total_points DESC, s.correct_tips DESC, s.user_id
+        """, [x for x in (group_id, round_id) if x]
+    # The live leaderboard. Ordering by the window's own key reuses its pass
+    # over idx_user_totals_rank, whose entries end in the rowid, so ties come
+    # out by user id without a second sort; a group's few rows are sorted
+    return f"""
+        SELECT RANK() OVER (ORDER BY ut.total_points DESC, ut.correct_tips DESC) rank,
+               u.id, u.display_name, ut.total_points, ut.correct_tips, ut.total_tips
+        FROM user_totals ut CROSS JOIN users u ON u.id=ut.user_id
+        {members.format("ut.user_id") if group_id else ""}
+        WHERE u.is_admin=0
+        ORDER BY ut.total_points DESC, ut.correct_tips DESC{", ut.user_id" if group_id else ""}
+    """, [group_id] if group_id else []
+
+def stream_rows(handler, cursor, fmt, filename):
+    # Chunked on HTTP/1.1; an HTTP/1.0 client gets the raw body and a close
+    columns = [d[0] for d in cursor.description]
+    chunked = handler.request_version == "HTTP/1.1"
+    handler.send_response(200)
+    handler.send_header("Content-Type", "text/csv; charset=utf-8" if fmt == "csv" else "application/x-ndjson")
+    handler.send_header("Content-Disposition", f'attachment; filename="{filename}.{fmt}"')
+    handler.send_header("Cache-Control", "no-store")
+    if chunked:
+        handler.send_header("Transfer-Encoding", "chunked")
+    else:
+        handler.close_connection = True
+        handler.send_header("Connection", "close")
+    handler.end_headers()
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator="\n")
+    if fmt == "csv":
+        writer.writerow(columns)
+    try:
+        while True:
+            rows = cursor.fetchmany(EXPORT_BATCH)
+            start = time.perf_counter()
+            if fmt == "csv":
+                writer.writerows(rows)
+            else:
+                for r in rows:
+                    out.write(json.dumps(dict(zip(columns, r)), default=str))
+                    out.write("\n")
+            data = out.getvalue().encode()
+            out.seek(0)
+            out.truncate()
+            clock.serialize += time.perf_counter() - start
+            if data:
+                handler.wfile.write(b"%x\r\n%s\r\n" % (len(data), data) if chunked else data)
+                handler.sent_bytes += len(data)
+            if not rows:
+                break
+        if chunked:
+            handler.wfile.write(b"0\r\n\r\n")
+        handler.wfile.flush()
+    except OSError:
+        handler.close_connection = True  # client went away or stopped reading mid-export
+
+EXPORT_FILTERS = {"users": ("group",), "tips": ("round", "group"), "fixtures": ("round",),
+                  "leaderboard": ("round", "group")}
+
+@route("GET", "/api/admin/export/<str:kind>")
+def admin_export(handler, kind):
+    # users, tips, fixtures or leaderboard as ?format=csv|ndjson (default
+    # ndjson), optionally narrowed by the filters in EXPORT_FILTERS
+    if not require_admin(handler): return
+    if kind not in EXPORT_FILTERS:
+        return json_response(handler, {"error": "Unknown export"}, 404)
+    fmt = handler.query.get("format", ["ndjson"])[0]
+    if fmt not in ("csv", "ndjson"):
+        return json_response(handler, {"error": "format must be csv or ndjson"}, 400)
+    unsupported = sorted(set(handler.query) - {"format", *EXPORT_FILTERS[kind]})
+    if unsupported:
+        return json_response(handler, {"error": f"The {kind} export can't be filtered by {', '.join(unsupported)}"}, 400)
+    filters = {}
+    for name in ("round", "group"):
+        value = handler.query.get(name, [""])[0]
+        if value and not is_whole_number(value):
+            return json_response(handler, {"error": f"{name} must be an id"}, 400)
+        filters[name] = int(value) if value else None
+    sql, params = export_query(kind, filters["round"], filters["group"])
+    filename = "-".join([kind] + [f"{k}{v}" for k, v in filters.items() if v])
+    with db() as conn:
+        cursor = conn.execute(sql, params)
+        try:
+            stream_rows(handler, cursor, fmt, filename)
+        finally:
+            cursor.close()  # ends the read transaction even if the client left early
+
+def valid_scores(*scores):
+    return all(type(x) is int and x >= 0 for x in scores)
+
+@route("PUT", "/api/admin/fixtures/<int:fixture_id>/result")
 def admin_enter_result(handler, fixture_id):
     if not require_admin(handler): return
     data = read_body(handler)
-    home_score = data["home_score"]
-    away_score = data["away_score"]
-    conn = db()
-    conn.execute(
-        "UPDATE fixtures SET home_score=?, away_score=?, status='completed' WHERE id=?",
-        (home_score, away_score, fixture_id)
-    )
-    # Calculate points for all tips on this fixture
-    # Margin categories: 0 = draw, 1-12 = 1-12, 13+ = 13+
-    # Frontend sends: draw=0, 1-12=7, 13+=20
-    fixture = conn.execute("SELECT * FROM fixtures WHERE id=?", (fixture_id,)).fetchone()
-    actual_margin = abs(home_score - away_score)
-    is_draw = (home_score == away_score)
-    actual_winner = None if is_draw else (fixture["home_team_id"] if home_score > away_score else fixture["away_team_id"])
-
-    # Determine actual margin category
-    if is_draw:
-        actual_cat = "draw"
-    elif actual_margin <= 12:
-        actual_cat = "1-12"
-    else:
-        actual_cat = "13+"
-
-    tips = conn.execute("SELECT * FROM tips WHERE fixture_id=?", (fixture_id,)).fetchall()
-    for tip in tips:
-        points = 0
-        pred_margin = tip["predicted_margin"]
-        # Determine predicted category from stored number
-        if pred_margin == 0:
-            pred_cat = "draw"
-        elif pred_margin <= 12:
-            pred_cat = "1-12"
-        else:
-            pred_cat = "13+"
-
-        if is_draw and pred_cat == "draw":
-            # Predicted draw correctly
-            points = 5  # 2 (correct result) + 3 (correct margin category)
-        elif not is_draw and tip["predicted_winner_id"] == actual_winner:
-            points = 2  # Correct winner
-            if pred_cat == actual_cat:
-                points += 3  # Correct margin category bonus
-        conn.execute("UPDATE tips SET points_earned=? WHERE id=?", (points, tip["id"]))
-    conn.commit()
-    conn.close()
+    scores = (data.get("home_score"), data.get("away_score"))
+    if not valid_scores(*scores):
+        return json_response(handler, {"error": "Scores must be whole numbers"}, 400)
+    with db() as conn:
+        cur = conn.execute(
+            "UPDATE fixtures SET home_score=?, away_score=?, status='completed' WHERE id=?",
+            (*scores, fixture_id)
+        )
+        if not cur.rowcount:
+            return json_response(handler, {"error": "Fixture not found"}, 404)
+        score_fixtures(conn, [fixture_id])
+        conn.commit()
+        publish_results(conn, [fixture_id])
+        versions.bump("fixtures", "leaderboard", "standings")
     return json_response(handler, {"success": True})
 
-def admin_create_team(handler):
+@route("PUT", "/api/admin/rounds/<int:round_id>/results")
+def admin_enter_round_results(handler, round_id):
     if not require_admin(handler): return
     data = read_body(handler)
-    conn = db()
-    try:
-        conn.execute("INSERT INTO teams (name, short_name, color) VALUES (?,?,?)",
-                      (data["name"], data["short_name"], data.get("color", "#1a1a2e")))
+    results = data.get("results") or []
+    if not results or not isinstance(results, list):
+        return json_response(handler, {"error": "No results provided"}, 400)
+    results = [r if isinstance(r, dict) else {} for r in results]
+    with db() as conn:
+        in_round = {r[0] for r in conn.execute("SELECT id FROM fixtures WHERE round_id=?", (round_id,))}
+        rows, errors = [], []
+        for i, r in enumerate(results):
+            fid = r.get("fixture_id")
+            scores = (r.get("home_score"), r.get("away_score"))
+            if type(fid) is not int:
+                errors.append({"index": i, "fixture_id": fid, "error": "fixture_id required"})
+            elif fid not in in_round:
+                errors.append({"index": i, "fixture_id": fid, "error": "Fixture not in this round"})
+            elif not valid_scores(*scores):
+                errors.append({"index": i, "fixture_id": fid, "error": "Scores must be whole numbers"})
+            else:
+                rows.append((*scores, fid))
+        if errors:
+            return json_response(handler, {"error": "Invalid results", "details": errors}, 400)
+        conn.executemany(
+            "UPDATE fixtures SET home_score=?, away_score=?, status='completed' WHERE id=?", rows
+        )
+        score_fixtures(conn, [r[2] for r in rows])
         conn.commit()
+        publish_results(conn, [r[2] for r in rows])
+        versions.bump("fixtures", "leaderboard", "standings")
+    return json_response(handler, {"success": True, "scored": len(rows)})
+
+@route("POST", "/api/admin/teams")
+def admin_create_team(handler):
+    if not require_admin(handler): return
+    data = read_body(handler)
+    with db() as conn:
+        try:
+            conn.execute("INSERT INTO teams (name, short_name, color) VALUES (?,?,?)",
+                          (data["name"], data["short_name"], data.get("color", "#1a1a2e")))
+            conn.commit()
+            versions.bump("teams")
+        except sqlite3.IntegrityError:
+            return json_response(handler, {"error": "Team already exists"}, 409)
         tid = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
-        conn.close()
-        return json_response(handler, {"id": tid}, 201)
-    except sqlite3.IntegrityError:
-        conn.close()
-        return json_response(handler, {"error": "Team already exists"}, 409)
+    return json_response(handler, {"id": tid}, 201)
 
+@route("PUT", "/api/admin/teams/<int:team_id>")
 def admin_update_team(handler, team_id):
     if not require_admin(handler): return
     data = read_body(handler)
-    conn = db()
     sets, vals = [], []
     for k in ("name", "short_name", "color"):
         if k in data:
@@ -541,148 +2545,598 @@ def admin_update_team(handler, team_id):
             vals.append(data[k])
     if sets:
         vals.append(team_id)
-        conn.execute(f"UPDATE teams SET {','.join(sets)} WHERE id=?", vals)
-        conn.commit()
-    conn.close()
+        with db() as conn:
+            conn.execute(f"UPDATE teams SET {','.join(sets)} WHERE id=?", vals)
+            conn.commit()
+            versions.bump("teams")
     return json_response(handler, {"success": True})
 
+@route("DELETE", "/api/admin/teams/<int:team_id>")
 def admin_delete_team(handler, team_id):
     if not require_admin(handler): return
-    conn = db()
-    conn.execute("DELETE FROM teams WHERE id=?", (team_id,))
-    conn.commit()
-    conn.close()
+    with db() as conn:
+        conn.execute("DELETE FROM teams WHERE id=?", (team_id,))
+        conn.commit()
+        versions.bump("teams")
     return json_response(handler, {"success": True})
 
+@route("DELETE", "/api/admin/users/<int:user_id>")
 def admin_delete_user(handler, user_id):
     if not require_admin(handler): return
-    conn = db()
-    conn.execute("DELETE FROM tips WHERE user_id=?", (user_id,))
-    conn.execute("DELETE FROM group_members WHERE user_id=?", (user_id,))
-    conn.execute("DELETE FROM users WHERE id=? AND is_admin=0", (user_id,))
-    conn.commit()
-    conn.close()
+    with db() as conn:
+        conn.execute("DELETE FROM tips WHERE user_id=?", (user_id,))
+        conn.execute("""
+            UPDATE groups_ SET member_count = member_count - 1
+            WHERE id IN (SELECT group_id FROM group_members WHERE user_id=?)
+        """, (user_id,))
+        conn.execute("DELETE FROM group_members WHERE user_id=?", (user_id,))
+        conn.execute("DELETE FROM round_scores WHERE user_id=?", (user_id,))
+        # Admins are not deleted but have lost their tips, so their totals reset
+        conn.execute("UPDATE user_totals SET total_points=0, total_tips=0, correct_tips=0 WHERE user_id=?", (user_id,))
+        conn.execute("DELETE FROM user_totals WHERE user_id IN (SELECT id FROM users WHERE id=? AND is_admin=0)", (user_id,))
+        if conn.execute("DELETE FROM users WHERE id=? AND is_admin=0", (user_id,)).rowcount:
+            sessions.revoke(conn, user_id=user_id)
+        conn.commit()
+        versions.bump("leaderboard", "standings")
     return json_response(handler, {"success": True})
 
+@route("POST", "/api/admin/rebuild-totals")
+def admin_rebuild_totals(handler):
+    if not require_admin(handler): return
+    with db() as conn:
+        n = rebuild_totals(conn)
+        g = recount_group_members(conn)
+        rebuild_round_scores(conn)
+        r = rebuild_standings(conn)
+        conn.commit()
+        versions.bump("leaderboard", "standings")
+    return json_response(handler, {"success": True, "users": n, "groups": g, "snapshots": r})
+
+@route("PUT", "/api/admin/users/<int:user_id>/toggle-admin")
 def admin_toggle_admin(handler, user_id):
     if not require_admin(handler): return
-    conn = db()
-    conn.execute("UPDATE users SET is_admin = CASE WHEN is_admin=1 THEN 0 ELSE 1 END WHERE id=?", (user_id,))
-    conn.commit()
-    conn.close()
+    with db() as conn:
+        conn.execute("UPDATE users SET is_admin = CASE WHEN is_admin=1 THEN 0 ELSE 1 END WHERE id=?", (user_id,))
+        sessions.set_admin(conn, user_id)
+    versions.bump("leaderboard")
     return json_response(handler, {"success": True})
 
 
-# ── Request Handler ──────────────────────────────────────────────────────
-
-class Handler(SimpleHTTPRequestHandler):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, directory=os.path.join(os.path.dirname(__file__), "public"), **kwargs)
-
-    def do_GET(self):
-        parsed = urlparse(self.path)
-        path = parsed.path
-        qs = parse_qs(parsed.query)
-
-        routes = {
-            "/api/me": api_me,
-            "/api/teams": api_teams,
-            "/api/rounds": api_rounds,
-            "/api/fixtures": api_fixtures,
-            "/api/leaderboard": api_leaderboard,
-            "/api/groups": api_my_groups,
-            "/api/admin/users": admin_users,
-        }
-
-        if path in routes:
-            return routes[path](self)
-
-        # Parameterized GET routes
-        m = re.match(r"/api/fixtures/round/(\d+)", path)
-        if m:
-            return api_fixtures(self, int(m.group(1)))
-
-        m = re.match(r"/api/tips/round/(\d+)", path)
-        if m:
-            return api_my_tips(self, int(m.group(1)))
-
-        m = re.match(r"/api/groups/(\d+)/leaderboard", path)
-        if m:
-            return api_group_leaderboard(self, int(m.group(1)))
-
-        # SPA fallback — serve index.html for non-file, non-api routes
-        if not path.startswith("/api/") and "." not in path.split("/")[-1]:
-            self.path = "/index.html"
-
-        return super().do_GET()
-
-    def do_POST(self):
-        path = urlparse(self.path).path
-
-        routes = {
-            "/api/register": api_register,
-            "/api/login": api_login,
-            "/api/tips": api_submit_tips,
-            "/api/groups/create": api_create_group,
-            "/api/groups/join": api_join_group,
-            "/api/admin/rounds": admin_create_round,
-            "/api/admin/fixtures": admin_create_fixture,
-            "/api/admin/teams": admin_create_team,
+# ── Static Assets ────────────────────────────────────────────────────────
+
+STATIC_DIR = os.path.join(os.path.dirname(__file__), "public")
+STATIC_WATCH = os.environ.get("STATIC_WATCH") == "1"  # dev: reload public/ when files change
+COMPRESSIBLE = ("text/", "application/javascript", "application/json", "application/manifest+json", "image/svg+xml")
+FINGERPRINTED = re.compile(r"\.[0-9a-f]{8,}\.\w+$")
+ASSET_REF = re.compile(r'((?:src|href)=")(/[^"?#]+\.(?:css|js))(")')
+
+class StaticAssets:
+    """Everything under public/ held in memory, with a gzip copy made up front
+    and a strong ETag per representation. HTML pages are rewritten to point
+    at content-fingerprinted CSS/JS URLs (/js/app.1a2b3c4d.js), which are
+    served with an immutable Cache-Control; everything else revalidates."""
+
+    def __init__(self, root):
+        self.root = root
+        self.files = {}       # url path -> asset
+        self._signature = None
+
+    def _scan(self):
+        found = {}
+        for dirpath, _, names in os.walk(self.root):
+            for name in names:
+                full = os.path.join(dirpath, name)
+                url = "/" + os.path.relpath(full, self.root).replace(os.sep, "/")
+                found[url] = (full, os.stat(full).st_mtime_ns)
+        return found
+
+    def load(self):
+        scanned = self._scan()
+        raw = {}
+        for url, (full, _) in scanned.items():
+            with open(full, "rb") as f:
+                raw[url] = f.read()
+        files = {}
+        fingerprints = {}
+        for url, data in raw.items():
+            if url.endswith((".css", ".js")) and url != "/sw.js":
+                stem, ext = os.path.splitext(url)
+                fingerprints[url] = f"{stem}.{hashlib.sha256(data).hexdigest()[:10]}{ext}"
+        for url, data in raw.items():
+            if url.endswith(".html"):
+                data = ASSET_REF.sub(lambda m: m[1] + fingerprints.get(m[2], m[2]) + m[3], data.decode()).encode()
+            files[url] = self._asset(url, data)
+        for url, alias in fingerprints.items():
+            files[alias] = self._asset(alias, raw[url])
+        self.files = files  # swapped in whole, so readers never see a half-built set
+        self._signature = {url: mtime for url, (_, mtime) in scanned.items()}
+
+    def _asset(self, url, data):
+        ctype = mimetypes.guess_type(url)[0] or "application/octet-stream"
+        if ctype.startswith("text/") or ctype == "application/javascript":
+            ctype += "; charset=utf-8"
+        etag = hashlib.sha256(data).hexdigest()[:32]
+        gz = None
+        if ctype.startswith(COMPRESSIBLE) and len(data) > 256:
+            gz = gzip.compress(data, 9, mtime=0)
+            if len(gz) >= len(data):
+                gz = None
+        return {
+            "type": ctype,
+            "body": data,
+            "etag": f'"{etag}"',
+            "gzip": gz,
+            "gzip_etag": f'"{etag}-gz"',
+            "cache": "public, max-age=31536000, immutable" if FINGERPRINTED.search(url) else "no-cache",
         }
 
-        if path in routes:
-            return routes[path](self)
-
-        return json_response(self, {"error": "Not found"}, 404)
-
-    def do_PUT(self):
-        path = urlparse(self.path).path
-
-        m = re.match(r"/api/admin/rounds/(\d+)", path)
-        if m:
-            return admin_update_round(self, int(m.group(1)))
-
-        m = re.match(r"/api/admin/fixtures/(\d+)/result", path)
-        if m:
-            return admin_enter_result(self, int(m.group(1)))
-
-        m = re.match(r"/api/admin/teams/(\d+)", path)
-        if m:
-            return admin_update_team(self, int(m.group(1)))
-
-        m = re.match(r"/api/admin/users/(\d+)/toggle-admin", path)
-        if m:
-            return admin_toggle_admin(self, int(m.group(1)))
-
-        return json_response(self, {"error": "Not found"}, 404)
+    def get(self, path):
+        asset = self.files.get(path)
+        # SPA fallback: extensionless paths get index.html
+        if asset is None and "." not in path.rsplit("/", 1)[-1]:
+            asset = self.files.get("/index.html")
+        return asset
+
+    def watch(self, interval=1.0):
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    scanned = self._scan()
+                    if {u: m for u, (_, m) in scanned.items()} != self._signature:
+                        self.load()
+                        print("  Reloaded static assets")
+                except OSError:
+                    pass  # file mid-save; try again next tick
+        threading.Thread(target=loop, name="static-watch", daemon=True).start()
+
+static_assets = StaticAssets(STATIC_DIR)
+
+def accepts_gzip(handler):
+    for part in handler.headers.get("Accept-Encoding", "").split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip().lower() in ("gzip", "*"):
+            q = params.strip()
+            if not q.startswith("q="):
+                return True
+            try:
+                return float(q[2:]) > 0
+            except ValueError:
+                return False
+    return False
+
+def serve_static(handler, path, head=False):
+    asset = static_assets.get(unquote(path))
+    if asset is None:
+        return handler.send_error(404, "File not found")
+    use_gzip = asset["gzip"] is not None and accepts_gzip(handler)
+    body, etag = (asset["gzip"], asset["gzip_etag"]) if use_gzip else (asset["body"], asset["etag"])
+    inm = handler.headers.get("If-None-Match")
+    status = 304 if inm and etag in [t.strip() for t in inm.split(",")] else 200
+    handler.send_response(status)
+    handler.send_header("ETag", etag)
+    handler.send_header("Cache-Control", asset["cache"])
+    if asset["gzip"] is not None:
+        handler.send_header("Vary", "Accept-Encoding")
+    if status == 200:
+        handler.send_header("Content-Type", asset["type"])
+        handler.send_header("Content-Length", len(body))
+        if use_gzip:
+            handler.send_header("Content-Encoding", "gzip")
+    handler.end_headers()
+    if status == 200 and not head:
+        handler.wfile.write(body)
 
-    def do_DELETE(self):
-        path = urlparse(self.path).path
 
-        m = re.match(r"/api/admin/teams/(\d+)", path)
-        if m:
-            return admin_delete_team(self, int(m.group(1)))
+# ── Request Handler ──────────────────────────────────────────────────────
 
-        m = re.match(r"/api/admin/users/(\d+)", path)
-        if m:
-            return admin_delete_user(self, int(m.group(1)))
+class Handler(BaseHTTPRequestHandler):
+    # Keep-alive: every response is Content-Length framed. A connection is
+    # closed after KEEPALIVE_TIMEOUT idle seconds, after KEEPALIVE_MAX_REQUESTS
+    # requests, when a request body was left unread, or when other
+    # connections are queued waiting for a worker. Headers and body go out
+    # in separate writes, so Nagle is off to avoid the delayed-ACK stall.
+    protocol_version = "HTTP/1.1"
+    timeout = KEEPALIVE_TIMEOUT
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.requests_handled = 0
+
+    def handle(self):
+        self.handle_one_request()
+        while not self.close_connection and self.wait_for_request():
+            self.handle_one_request()
+
+    def wait_for_request(self):
+        # An idle connection keeps its worker, so give it up as soon as other
+        # connections are queued rather than after the full KEEPALIVE_TIMEOUT
+        sock = self.connection
+        sock.settimeout(0)
+        try:
+            if self.rfile.peek(1):
+                return True  # pipelined request already buffered
+        except OSError:
+            return False
+        finally:
+            sock.settimeout(self.timeout)
+        pending = getattr(self.server, "pending", None)
+        deadline = time.monotonic() + KEEPALIVE_TIMEOUT
+        with selectors.DefaultSelector() as sel:
+            sel.register(sock, selectors.EVENT_READ)
+            while time.monotonic() < deadline:
+                if sel.select(KEEPALIVE_POLL):
+                    return True
+                if pending is not None and not pending.empty():
+                    return False
+        return False
+
+    def parse_request(self):
+        self.requests_handled += 1
+        self.body_read = False
+        return super().parse_request()
+
+    def end_headers(self):
+        if not self.close_connection and self.should_close():
+            self.send_header("Connection", "close")
+        super().end_headers()
+
+    def should_close(self):
+        if self.requests_handled >= KEEPALIVE_MAX_REQUESTS:
+            return True
+        headers = getattr(self, "headers", None)
+        if headers is None:
+            return True  # request line itself was bad
+        if not self.body_read and (headers.get("Content-Length", "0") != "0" or "Transfer-Encoding" in headers):
+            return True
+        pending = getattr(self.server, "pending", None)
+        return pending is not None and not pending.empty()
+
+    def start_stream(self):
+        # Hand the socket to the event hub so this worker goes back to the pool
+        self.wfile.flush()
+        self.server.detach(self.request)
+        stream_hub.attach(SocketStream(self.request))
+
+    def send_response(self, code, message=None):
+        self.status = code
+        super().send_response(code, message)
+
+    def send_header(self, keyword, value):
+        if keyword == "Content-Length":
+            self.sent_bytes = int(value)
+        super().send_header(keyword, value)
+
+    def dispatch(self):
+        start = time.perf_counter()
+        clock.sql = clock.serialize = 0.0
+        clock.route = None
+        self.status = self.sent_bytes = 0
+        self.route_name = "not_found"
+        try:
+            self.route_request()
+        finally:
+            metrics.record(self.route_name, self.status or 500, time.perf_counter() - start,
+                           self.sent_bytes, clock.sql, clock.serialize)
 
-        return json_response(self, {"error": "Not found"}, 404)
+    def route_request(self):
+        parsed = urlparse(self.path)
+        path = parsed.path
+        if not path.startswith("/api/"):
+            if self.command in ("GET", "HEAD"):
+                self.route_name = "static"
+                return serve_static(self, path, head=self.command == "HEAD")
+            return json_response(self, {"error": "Not found"}, 404)
+        methods, params = routes.match(path)
+        if not methods:
+            return json_response(self, {"error": "Not found"}, 404)
+        fn = methods.get(self.command)
+        if not fn:
+            self.route_name = "method_not_allowed"
+            return json_response(self, {"error": "Method not allowed"}, 405,
+                                 headers={"Allow": ", ".join(sorted(methods))})
+        self.route_name = clock.route = fn.__name__
+        self.query = parse_qs(parsed.query)
+        return fn(self, **params)
+
+    do_GET = do_HEAD = do_POST = do_PUT = do_DELETE = do_PATCH = do_OPTIONS = dispatch
 
     def log_message(self, format, *args):
         # Quieter logging
-        if "/api/" in (args[0] if args else ""):
+        if args and "/api/" in str(args[0]):
             print(f"  API: {args[0]}")
 
 
+# ── Server ───────────────────────────────────────────────────────────────
+
+BUSY_RESPONSE = (
+    b"HTTP/1.1 503 Service Unavailable\r\n"
+    b"Content-Type: application/json\r\n"
+    b"Content-Length: 41\r\n"
+    b"Retry-After: 1\r\n"
+    b"Connection: close\r\n\r\n"
+    b'{"error": "Server busy, try again soon"}\n'
+)
+
+class PooledHTTPServer(HTTPServer):
+    """HTTPServer that hands accepted connections to a fixed pool of worker
+    threads through a bounded queue. When the queue is full the connection
+    is answered with a 503 straight away instead of waiting in line."""
+    request_queue_size = 128  # listen() backlog
+
+    def __init__(self, addr, handler, workers=WORKERS, queue_depth=QUEUE_DEPTH):
+        super().__init__(addr, handler)
+        self.pending = queue.Queue(maxsize=queue_depth)
+        self.detached = set()
+        self.workers = [threading.Thread(target=self._work, name=f"worker-{i}", daemon=True)
+                        for i in range(workers)]
+        for t in self.workers:
+            t.start()
+
+    def process_request(self, request, client_address):
+        try:
+            self.pending.put_nowait((request, client_address))
+        except queue.Full:
+            try:
+                request.sendall(BUSY_RESPONSE)
+            except OSError:
+                pass
+            self.shutdown_request(request)
+
+    def detach(self, request):
+        self.detached.add(request)
+
+    def shutdown_request(self, request):
+        if request in self.detached:
+            self.detached.discard(request)  # now owned by the event hub
+            return
+        super().shutdown_request(request)
+
+    def _work(self):
+        while True:
+            item = self.pending.get()
+            if item is None:
+                return
+            request, client_address = item
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    def server_close(self):
+        # Stop accepting, then let the workers drain whatever is already queued
+        super().server_close()
+        stream_hub.close_all()
+        for _ in self.workers:
+            self.pending.put(None)
+        deadline = time.monotonic() + SHUTDOWN_GRACE
+        for t in self.workers:
+            t.join(max(0, deadline - time.monotonic()))
+
+
+# ── Async Server ─────────────────────────────────────────────────────────
+
+class TransportWriter:
+    """wfile for a Handler running on an executor thread: buffers the
+    response and hands it to the event loop on flush(), waiting for the
+    transport to drain so a slow reader pushes back on the handler."""
+    FLUSH_AT = 64 * 1024
+
+    def __init__(self, loop, writer):
+        self.loop, self.writer = loop, writer
+        self.buf = bytearray()
+
+    def write(self, data):
+        self.buf += data
+        if len(self.buf) >= self.FLUSH_AT:
+            self.flush()
+        return len(data)
+
+    def flush(self):
+        if self.buf:
+            data, self.buf = bytes(self.buf), bytearray()
+            asyncio.run_coroutine_threadsafe(self._send(data), self.loop).result()
+
+    async def _send(self, data):
+        self.writer.write(data)
+        await self.writer.drain()
+
+
+class AsyncExchange(Handler):
+    """One request already framed by the event loop, run through the
+    regular Handler so routing, static files and responses are shared."""
+
+    def __init__(self, raw, wfile, client_address, server, requests_handled):
+        self.stream = None
+        self.rfile = io.BytesIO(raw)
+        self.wfile = wfile
+        self.client_address = client_address
+        self.server = server
+        self.requests_handled = requests_handled
+        self.close_connection = True
+        self.handle_one_request()
+        self.wfile.flush()
+
+    def should_close(self):
+        return super().should_close() or self.server.stopping
+
+    def start_stream(self):
+        self.wfile.flush()
+        self.stream = TransportStream(self.wfile.loop, self.wfile.writer)
+        stream_hub.attach(self.stream)
+
+
+class TransportStream:
+    """An /api/stream client on the asyncio server. The hub thread schedules
+    writes on the loop; the transport's own buffer is the backpressure."""
+    sock = None
+
+    def __init__(self, loop, writer):
+        self.loop, self.writer = loop, writer
+
+    def send(self, data):
+        if self.writer.transport.get_write_buffer_size() + len(data) > SSE_CLIENT_BUFFER:
+            return False
+        self.loop.call_soon_threadsafe(self.writer.write, data)
+        return True
+
+    def close(self):
+        try:
+            self.loop.call_soon_threadsafe(self.writer.close)
+        except RuntimeError:
+            pass  # loop already closed
+
+    async def hold(self, reader):
+        # Clients never send anything; EOF means they hung up or were dropped
+        try:
+            while await reader.read(4096):
+                pass
+        finally:
+            stream_hub.detach(self)
+
+
+class AsyncHTTPServer:
+    """asyncio front end: the event loop accepts connections and reads
+    requests, so idle and slow keep-alive clients cost a buffer rather than
+    a thread. Each complete request runs on a thread pool (sqlite3 work;
+    PBKDF2 still goes on to the auth processes). Past WORKERS + QUEUE_DEPTH
+    requests in flight new ones get the same 503 as the threaded server."""
+
+    def __init__(self, addr, workers=WORKERS, queue_depth=QUEUE_DEPTH):
+        self.addr = addr
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="worker")
+        self.capacity = workers + queue_depth
+        self.in_flight = 0
+        self.clients = set()
+        self.stopping = False
+
+    async def serve(self):
+        loop = asyncio.get_running_loop()
+        stop = asyncio.Event()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, stop.set)
+        server = await asyncio.start_server(self.client, *self.addr, limit=MAX_HEADER_BYTES, backlog=1024)
+        await stop.wait()
+        # Stop accepting, let in-flight requests finish, then drop idle connections
+        self.stopping = True
+        server.close()
+        stream_hub.close_all()
+        if self.clients:
+            await asyncio.wait(list(self.clients), timeout=SHUTDOWN_GRACE)
+        for task in self.clients:
+            task.cancel()
+        await server.wait_closed()
+        await loop.run_in_executor(None, self.executor.shutdown)
+
+    async def client(self, reader, writer):
+        task = asyncio.current_task()
+        if len(self.clients) >= ASYNC_MAX_CONNECTIONS:
+            writer.write(BUSY_RESPONSE)
+            writer.close()
+            return
+        self.clients.add(task)
+        peer = writer.get_extra_info("peername")
+        wfile = TransportWriter(asyncio.get_running_loop(), writer)
+        try:
+            requests_handled = 0
+            while not self.stopping:
+                raw = await self.read_request(reader)
+                if raw is None:
+                    break
+                if self.in_flight >= self.capacity:
+                    writer.write(BUSY_RESPONSE)
+                    break
+                self.in_flight += 1
+                try:
+                    exchange = await asyncio.get_running_loop().run_in_executor(
+                        self.executor, AsyncExchange, raw, wfile, peer, self, requests_handled)
+                finally:
+                    self.in_flight -= 1
+                requests_handled = exchange.requests_handled
+                if exchange.stream:
+                    await exchange.stream.hold(reader)
+                    break
+                if exchange.close_connection:
+                    break
+            await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        except Exception:
+            print(f"Exception serving {peer}", file=sys.stderr)
+            traceback.print_exc()
+        finally:
+            self.clients.discard(task)
+            writer.close()
+
+    async def read_request(self, reader):
+        # Request line and headers, then a Content-Length body. Anything else
+        # (chunked uploads) is passed on unread and the Handler closes after.
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEPALIVE_TIMEOUT)
+            m = re.search(rb"\r\ncontent-length:[ \t]*(\d+)", head, re.I)
+            if not m or int(m.group(1)) == 0:
+                return head
+            return head + await asyncio.wait_for(reader.readexactly(int(m.group(1))), KEEPALIVE_TIMEOUT)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            return None
+
+
 # ── Main ─────────────────────────────────────────────────────────────────
 
 if __name__ == "__main__":
+    if sys.argv[1:] == ["rebuild-totals"]:
+        init_db()
+        with db() as conn:
+            n = rebuild_totals(conn)
+            g = recount_group_members(conn)
+            rebuild_round_scores(conn)
+            r = rebuild_standings(conn)
+            conn.commit()
+        print(f"  Rebuilt leaderboard totals for {n} users, member counts for {g} groups "
+              f"and standings for {r} rounds")
+        sys.exit(0)
+    if sys.argv[1:] == ["backup"]:
+        init_db()
+        backups.start("cli").join()
+        print(f"  Backup: {json.dumps(backups.last)}")
+        sys.exit(0 if backups.last["ok"] else 1)
+
     print("╔══════════════════════════════════════╗")
     print("║   CMK Club Rugby Tipping — Taranaki  ║")
     print("╚══════════════════════════════════════╝")
     init_db()
-    server = HTTPServer(("0.0.0.0", PORT), Handler)
-    print(f"\n  → Running on http://localhost:{PORT}")
+    static_assets.load()
+    if STATIC_WATCH:
+        static_assets.watch()
+    if BACKUP_INTERVAL > 0:
+        backups.schedule(BACKUP_INTERVAL)
+    if SERVER_MODE == "asyncio":
+        print(f"\n  → Running on http://localhost:{PORT} (asyncio, {WORKERS} workers, "
+              f"up to {ASYNC_MAX_CONNECTIONS} connections)")
+        print(f"  → Admin panel at http://localhost:{PORT}/admin.html\n")
+        try:
+            asyncio.run(AsyncHTTPServer(("0.0.0.0", PORT)).serve())
+        finally:
+            backups.stop()
+            shutdown_auth_pool()
+            pool.close_all()
+            print("\n  Server stopped")
+        sys.exit(0)
+    server = PooledHTTPServer(("0.0.0.0", PORT), Handler)
+    # serve_forever() must be stopped from another thread
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+    print(f"\n  → Running on http://localhost:{PORT} ({WORKERS} workers, queue {QUEUE_DEPTH})")
     print(f"  → Admin panel at http://localhost:{PORT}/admin.html\n")
-    server.serve_forever()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        backups.stop()
+        shutdown_auth_pool()
+        pool.close_all()
+        print("\n  Server stopped")